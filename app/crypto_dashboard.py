@@ -11,11 +11,13 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 from core.exchange_client import ExchangeClient
+from core.ohlcv_cache import OHLCVCache
 from core.market_data import depth_snapshot, mid_from_order_book
 from core.ndf_pricer import make_ndf_quote
 from core.execution import vwap_execute, twap_execute
 from core.microprice_simulator import microprice_path
 from core.risk import historical_var, stress_scenarios
+from core.returns import Returns
 from config import EXCHANGE_SPOT, PAIR_SPOT, EXCHANGE_PERP, PAIR_PERP, SEED
 
 #----------------- Page Setup--------------
@@ -28,36 +30,62 @@ market_option = st.radio(
     ('Spot', 'Perp', 'Both'),
     index=2
 )
-
-# ---------------- Initialise Clients ----------------
-spot_client = ExchangeClient(EXCHANGE_SPOT)
-perp_client = ExchangeClient(EXCHANGE_PERP)
-
-def get_mid_and_snapshot(client, pair):
-    ob = client.order_book(pair, limit=50)
+MARKETS = {'Spot': (EXCHANGE_SPOT, PAIR_SPOT), 'Perp': (EXCHANGE_PERP, PAIR_PERP)}
+selected = list(MARKETS) if market_option == 'Both' else [market_option]
+
+# ---------------- Cached clients & data ----------------
+# Clients and the OHLCV cache are shared by every session in the process;
+# market data is cached with a TTL and heavy computations are memoized on
+# their inputs, so moving a slider only recomputes the section it feeds.
+BOOK_TTL_S = 5
+OHLCV_TTL_S = 300
+
+@st.cache_resource
+def get_client(market_type):
+    return ExchangeClient(market_type)
+
+@st.cache_resource
+def get_ohlcv_cache():
+    return OHLCVCache()
+
+@st.cache_data(ttl=BOOK_TTL_S, show_spinner=False)
+def get_mid_and_snapshot(market_type, pair):
+    ob = get_client(market_type).order_book(pair, limit=50)
     mid = mid_from_order_book(ob['bids'], ob['asks'])
     snap = depth_snapshot(ob['bids'], ob['asks'], depth=20)
     return ob, mid, snap
 
-# Spot data
-ob_spot, mid_spot, snap_spot = get_mid_and_snapshot(spot_client, PAIR_SPOT)
-# Perp data
-ob_perp, mid_perp, snap_perp = get_mid_and_snapshot(perp_client, PAIR_PERP)
+@st.cache_data(ttl=OHLCV_TTL_S, show_spinner=False)
+def get_daily_returns(market_type, pair):
+    candles = get_ohlcv_cache().ohlcv(get_client(market_type), pair, timeframe='1h', limit=24*250)
+    # overlapping 24h returns from one log-price difference, as simple returns for historical_var
+    return np.expm1(Returns.from_ohlcv(candles).horizon(24))
+
+@st.cache_data(show_spinner=False)
+def run_execution(mid_price, target_notional):
+    qty = target_notional / mid_price
+    path = microprice_path(mid_price, n=60, sigma_bp=30, seed=SEED)
+    volumes = np.random.default_rng(SEED).integers(1, 20, size=60)
+    vwap_res = vwap_execute(path, volumes, qty)
+    twap_res = twap_execute(path, qty)
+    return path, vwap_res, twap_res
+
+@st.cache_data(show_spinner=False)
+def run_stress(mid_price, target_notional):
+    return stress_scenarios(current_price=mid_price, position_qty=target_notional/mid_price)
+
+# Only the selected markets are fetched
+books = {m: get_mid_and_snapshot(*MARKETS[m]) for m in selected}
 
 # ---------------- Display Order Book ----------------
 st.subheader('Order Book Depth')
 
-if market_option in ('Spot', 'Both'):
-    st.write('Spot')
-    st.bar_chart(snap_spot.pivot_table(index='price', columns='side', values='size', aggfunc='sum'))
-    st.metric(label='Mid price (Spot)', value=f'{mid_spot:,.2f}')
-    st.metric(label='Spread (Spot)', value=f'{ob_spot["asks"][0][0] - ob_spot["bids"][0][0]:.2f}')
-
-if market_option in ('Perp', 'Both'):
-    st.write('Perp')
-    st.bar_chart(snap_perp.pivot_table(index='price', columns='side', values='size', aggfunc='sum'))
-    st.metric(label='Mid price (Perp)', value=f'{mid_perp:,.2f}')
-    st.metric(label='Spread (Perp)', value=f'{ob_perp["asks"][0][0] - ob_perp["bids"][0][0]:.2f}')
+for m in selected:
+    ob, mid, snap = books[m]
+    st.write(m)
+    st.bar_chart(snap.pivot_table(index='price', columns='side', values='size', aggfunc='sum'))
+    st.metric(label=f'Mid price ({m})', value=f'{mid:,.2f}')
+    st.metric(label=f'Spread ({m})', value=f'{ob["asks"][0][0] - ob["bids"][0][0]:.2f}')
 
 st.markdown('---')
 
@@ -65,15 +93,19 @@ st.markdown('---')
 st.subheader('OTC NDF Quote (1W)')
 r_annual = st.slider('r (annual)', 0.0, 0.15, 0.05, 0.01)
 q_annual = st.slider('q (annual)', 0.0, 0.15, 0.02, 0.01)
+if st.checkbox('Use live perp funding for q'):
+    # served from the shared carry store, refetched at most every FUNDING_TTL_S
+    live_q = get_client(EXCHANGE_PERP).funding_rate(PAIR_PERP)['funding_annual']
+    if np.isnan(live_q):
+        st.warning('No funding rate returned for the perp; keeping the slider value for q')
+    else:
+        q_annual = live_q
+        st.write(f'Live annualized funding: {q_annual:.2%}')
 spread_bp = st.slider('Dealer spread (bp)', 5, 50, 25, 5)
 
-if market_option in ('Spot', 'Both'):
-    ndf_spot = make_ndf_quote(mid_spot, r_annual, q_annual, tenor_days=7, spread_bp=spread_bp)
-    st.write(f'Spot Forward: {ndf_spot.forward:,.2f} | Bid: {ndf_spot.bid:,.2f} | Ask: {ndf_spot.ask:,.2f}')
-
-if market_option in ('Perp', 'Both'):
-    ndf_perp = make_ndf_quote(mid_perp, r_annual, q_annual, tenor_days=7, spread_bp=spread_bp)
-    st.write(f'Perp Forward: {ndf_perp.forward:,.2f} | Bid: {ndf_perp.bid:,.2f} | Ask: {ndf_perp.ask:,.2f}')
+for m in selected:
+    ndf = make_ndf_quote(books[m][1], r_annual, q_annual, tenor_days=7, spread_bp=spread_bp)
+    st.write(f'{m} Forward: {ndf.forward:,.2f} | Bid: {ndf.bid:,.2f} | Ask: {ndf.ask:,.2f}')
 
 st.markdown('---')
 
@@ -81,30 +113,14 @@ st.markdown('---')
 st.subheader('Block Trade Execution Simulator')
 target_notional = st.slider('Target notional (USD)', 10_000, 500_000, 100_000, 10_000)
 
-def run_execution(mid_price):
-    qty = target_notional / mid_price
-    path = microprice_path(mid_price, n=60, sigma_bp=30, seed=SEED)
-    volumes = np.random.default_rng(SEED).integers(1, 20, size=60)
-    vwap_res = vwap_execute(path, volumes, qty)
-    twap_res = twap_execute(path, qty)
-    return path, vwap_res, twap_res
-
-if market_option in ('Spot', 'Both'):
-    path_spot, vwap_spot, twap_spot = run_execution(mid_spot)
-    st.write(f'Spot VWAP avg: {vwap_spot.avg_price:,.2f} | Slippage: {vwap_spot.slippage_bps:.1f} bp')
-    st.write(f'Spot TWAP avg: {twap_spot.avg_price:,.2f} | Slippage: {twap_spot.slippage_bps:.1f} bp')
-
-if market_option in ('Perp', 'Both'):
-    path_perp, vwap_perp, twap_perp = run_execution(mid_perp)
-    st.write(f'Perp VWAP avg: {vwap_perp.avg_price:,.2f} | Slippage: {vwap_perp.slippage_bps:.1f} bp')
-    st.write(f'Perp TWAP avg: {twap_perp.avg_price:,.2f} | Slippage: {twap_perp.slippage_bps:.1f} bp')
+chart_data = {}
+for m in selected:
+    path, vwap_res, twap_res = run_execution(books[m][1], target_notional)
+    st.write(f'{m} VWAP avg: {vwap_res.avg_price:,.2f} | Slippage: {vwap_res.slippage_bps:.1f} bp')
+    st.write(f'{m} TWAP avg: {twap_res.avg_price:,.2f} | Slippage: {twap_res.slippage_bps:.1f} bp')
+    chart_data[f'{m} Microprice'] = path
 
 # ---------------- Microprice Chart ----------------
-chart_data = {}
-if market_option in ('Spot', 'Both'):
-    chart_data['Spot Microprice'] = path_spot
-if market_option in ('Perp', 'Both'):
-    chart_data['Perp Microprice'] = path_perp
 st.line_chart(pd.DataFrame(chart_data))
 
 st.markdown('---')
@@ -113,31 +129,15 @@ st.markdown('---')
 # ---------------- Risk Metrics ----------------
 st.subheader('Risk Metrics')
 
-if market_option in ('Spot', 'Both'):
-    ohlcv_spot = spot_client.ohlcv(PAIR_SPOT, timeframe='1h', limit=24*250)
-    df_spot = pd.DataFrame(ohlcv_spot, columns=['ts','open','high','low','close','vol'])
-    df_spot['ret'] = df_spot['close'].pct_change()
-    daily_spot = df_spot['ret'].rolling(24).sum().dropna()
-    var_99_spot = historical_var(daily_spot, alpha=0.99, notional=target_notional)
-    st.write(f'Spot 99% VaR: ${var_99_spot:,.0f}')
-    
-    stress_spot = stress_scenarios(current_price=mid_spot, position_qty=target_notional/mid_spot)
-    st.write('Spot Stress Scenarios')
-    st.dataframe(stress_spot)
-    st.bar_chart(stress_spot.set_index('Shock')['Net PnL'])
-
-if market_option in ('Perp', 'Both'):
-    ohlcv_perp = perp_client.ohlcv(PAIR_PERP, timeframe='1h', limit=24*250)
-    df_perp = pd.DataFrame(ohlcv_perp, columns=['ts','open','high','low','close','vol'])
-    df_perp['ret'] = df_perp['close'].pct_change()
-    daily_perp = df_perp['ret'].rolling(24).sum().dropna()
-    var_99_perp = historical_var(daily_perp, alpha=0.99, notional=target_notional)
-    st.write(f'Perp 99% VaR: ${var_99_perp:,.0f}')
-    
-    stress_perp = stress_scenarios(current_price=mid_perp, position_qty=target_notional/mid_perp)
-    st.write('Perp Stress Scenarios')
-    st.dataframe(stress_perp)
-    st.bar_chart(stress_perp.set_index('Shock')['Net PnL'])
+for m in selected:
+    daily = get_daily_returns(*MARKETS[m])
+    var_99 = historical_var(daily, alpha=0.99, notional=target_notional)
+    st.write(f'{m} 99% VaR: ${var_99:,.0f}')
+
+    stress = run_stress(books[m][1], target_notional)
+    st.write(f'{m} Stress Scenarios')
+    st.dataframe(stress)
+    st.bar_chart(stress.set_index('Shock')['Net PnL'])
 
 # st.subheader('Risk Metrics')
 
@@ -0,0 +1,232 @@
+"""
+Benchmarks for the core hot paths at realistic and large sizes.
+
+Each case is timed (best of --repeat runs) and run once more under tracemalloc
+for peak memory. Results are printed, optionally written as JSON, and compared
+against a stored baseline; a case slower than baseline * (1 + --tolerance)
+counts as a regression and makes the run exit non-zero.
+
+    python benchmarks/bench_core.py                       # all cases
+    python benchmarks/bench_core.py -k var --size large   # filter by name / size
+    python benchmarks/bench_core.py --json out.json
+    python benchmarks/bench_core.py --save-baseline       # store benchmarks/baseline.json
+    python benchmarks/bench_core.py --compare             # compare against it
+
+Baselines are machine-specific, so they are not committed.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from benchmarks.fakes import FakeExchange
+from core.risk import historical_var, stress_scenarios, stress_grid
+from core.execution import vwap_execute, twap_execute
+from core.microprice_simulator import microprice_path, simulate_paths
+from core.ndf_pricer import crypto_forward_curve, make_ndf_quote, forward_board
+from core.market_data import depth_snapshot, poll_order_book, poll_order_books_concurrent
+from core.l2_book import L2Book
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+SIZES = ('realistic', 'large')
+
+
+def _cases():
+    """name -> {size: (setup() -> state, run(state), items processed per run)}"""
+    rng = np.random.default_rng(0)
+
+    def returns(n):
+        return lambda: rng.standard_t(4, n) * 0.01
+
+    def prices(n):
+        return lambda: (87000 * np.exp(np.cumsum(rng.normal(0, 1e-3, n))), rng.integers(1, 20, n).astype(float))
+
+    def book(levels):
+        def setup():
+            ob = FakeExchange(levels=levels).fetch_order_book('BTC/USDT', limit=levels)
+            return ob['bids'], ob['asks']
+        return setup
+
+    def diffs(levels, n):
+        def setup():
+            ob = FakeExchange(levels=levels).fetch_order_book('BTC/USDT', limit=levels)
+            px = rng.choice([p for p, _ in ob['bids']], n)
+            qty = np.where(rng.random(n) < 0.3, 0.0, rng.uniform(0.01, 5.0, n))
+            events = [{'U': i, 'u': i, 'b': [[float(p), float(q)]], 'a': []}
+                      for i, (p, q) in enumerate(zip(px, qty), start=1)]
+            return L2Book('BTC/USDT'), ob, events
+        return setup
+
+    def apply_diffs(state):
+        book, ob, events = state
+        book.apply_snapshot(ob['bids'], ob['asks'], 0)
+        for ev in events:
+            book.apply_diff(ev)
+
+    shocks_large = np.linspace(-0.5, 0.5, 400)
+    mults_large = np.linspace(1.0, 3.0, 30)
+    prices_book = rng.uniform(100, 90000, 50)
+    qty_book = rng.uniform(-5, 5, 50)
+
+    return {
+        'stress_scenarios': {
+            'realistic': (lambda: None, lambda _: stress_scenarios(87000.0, position_qty=5.7), 36),
+            'large': (lambda: None,
+                      lambda _: stress_scenarios(87000.0, shocks_pct=shocks_large, position_qty=5.7,
+                                                 fee_multipliers=mults_large, vol_multipliers=mults_large),
+                      400 * 30 * 30),
+        },
+        'stress_grid_book': {
+            'realistic': (lambda: None, lambda _: stress_grid(prices_book, position_qty=qty_book, layout='cube'),
+                          50 * 36),
+            'large': (lambda: None,
+                      lambda _: stress_grid(prices_book, shocks_large, qty_book, fee_multipliers=mults_large,
+                                            vol_multipliers=mults_large, layout='cube'),
+                      50 * 400 * 30 * 30),
+        },
+        'historical_var': {
+            'realistic': (returns(24 * 250), lambda r: historical_var(r, 0.99, 5e5), 24 * 250),
+            'large': (returns(2_000_000), lambda r: historical_var(r, 0.99, 5e5), 2_000_000),
+        },
+        'vwap_execute': {
+            'realistic': (prices(60), lambda pv: vwap_execute(pv[0], pv[1], 5.0), 60),
+            'large': (prices(1_000_000), lambda pv: vwap_execute(pv[0], pv[1], 5.0), 1_000_000),
+        },
+        'twap_execute': {
+            'realistic': (prices(60), lambda pv: twap_execute(pv[0], 5.0), 60),
+            'large': (prices(1_000_000), lambda pv: twap_execute(pv[0], 5.0), 1_000_000),
+        },
+        'microprice_path': {
+            'realistic': (lambda: None, lambda _: microprice_path(87000.0, 60), 60),
+            'large': (lambda: None, lambda _: microprice_path(87000.0, 1_000_000), 1_000_000),
+        },
+        'simulate_paths': {
+            'realistic': (lambda: None, lambda _: simulate_paths(87000.0, 10_000, 60), 600_000),
+            'large': (lambda: None, lambda _: simulate_paths(87000.0, 100_000, 240), 24_000_000),
+        },
+        'crypto_forward_curve': {
+            'realistic': (lambda: None, lambda _: crypto_forward_curve(87000.0, 0.05, 0.02, [1, 7, 30, 90, 180]), 5),
+            'large': (lambda: None, lambda _: crypto_forward_curve(87000.0, 0.05, 0.02, list(range(1, 3651))), 3650),
+        },
+        'make_ndf_quote': {
+            'realistic': (lambda: None, lambda _: make_ndf_quote(87000.0, 0.05, 0.02, 7, 25), 1),
+            'large': (lambda: None,
+                      lambda _: [make_ndf_quote(87000.0 + i, 0.05, 0.02, 7, 25) for i in range(10_000)], 10_000),
+        },
+        'forward_board': {
+            'realistic': (lambda: None, lambda _: forward_board(prices_book, 0.05, 0.02, [1, 7, 30, 90, 180]), 250),
+            'large': (lambda: None,
+                      lambda _: forward_board(rng.uniform(100, 90000, 5000), 0.05, 0.02, np.arange(1, 366)),
+                      5000 * 365),
+        },
+        'depth_snapshot': {
+            'realistic': (book(50), lambda ba: depth_snapshot(ba[0], ba[1], depth=20), 40),
+            'large': (book(5000), lambda ba: depth_snapshot(ba[0], ba[1], depth=5000), 10_000),
+        },
+        'l2_book_diffs': {
+            'realistic': (diffs(5000, 10_000), apply_diffs, 10_000),
+            'large': (diffs(100_000, 100_000), apply_diffs, 100_000),
+        },
+        'poll_order_book': {
+            'realistic': (lambda: FakeExchange(levels=50),
+                          lambda fx: poll_order_book(fx, 'BTC/USDT', limit=50, n=20, sleep_s=0.0), 20),
+            'large': (lambda: FakeExchange(levels=1000),
+                      lambda fx: poll_order_book(fx, 'BTC/USDT', limit=1000, n=200, sleep_s=0.0), 200),
+        },
+        'poll_order_books_concurrent': {
+            'realistic': (lambda: {'spot': FakeExchange(latency_s=0.005), 'perp': FakeExchange(latency_s=0.005)},
+                          lambda cl: poll_order_books_concurrent(cl, ['BTC/USDT'], n=10, interval_s=0.0), 20),
+            'large': (lambda: {'spot': FakeExchange(latency_s=0.005), 'perp': FakeExchange(latency_s=0.005)},
+                      lambda cl: poll_order_books_concurrent(cl, [f'S{i}/USDT' for i in range(20)], n=10,
+                                                             interval_s=0.0), 400),
+        },
+    }
+
+
+def run_case(setup, fn, items: int, repeat: int) -> dict:
+    state = setup()
+    fn(state)  # warm-up (lazy imports, caches)
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(state)
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    fn(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': best, 'throughput_per_s': items / best if best > 0 else float('inf'),
+            'peak_mb': peak / 1e6, 'items': items}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Names of cases slower than baseline * (1 + tolerance)."""
+    regressions = []
+    for key, res in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        ratio = res['seconds'] / base['seconds'] if base['seconds'] > 0 else 1.0
+        res['vs_baseline'] = ratio
+        if ratio > 1 + tolerance:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-k', dest='filter', help='only cases whose name contains this string')
+    parser.add_argument('--size', choices=SIZES, help='only this size')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store results as the baseline')
+    parser.add_argument('--compare', action='store_true', help='compare against the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before a regression')
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, sizes in _cases().items():
+        if args.filter and args.filter not in name:
+            continue
+        for size, (setup, fn, items) in sizes.items():
+            if args.size and size != args.size:
+                continue
+            key = f'{name}[{size}]'
+            res = run_case(setup, fn, items, max(1, args.repeat // 2) if size == 'large' else args.repeat)
+            results[key] = res
+            print(f"{key:42} {res['seconds'] * 1000:10.3f} ms  {res['throughput_per_s']:14,.0f} items/s  "
+                  f"{res['peak_mb']:9.2f} MB peak")
+
+    regressions = []
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f'No baseline at {args.baseline}; run with --save-baseline first')
+            return 2
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)['results'], args.tolerance)
+        for key in regressions:
+            print(f"REGRESSION {key}: {results[key]['vs_baseline']:.2f}x baseline")
+
+    payload = {'python': platform.python_version(), 'numpy': np.__version__,
+               'machine': platform.machine(), 'results': results}
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(payload, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(payload, f, indent=2)
+        print(f'Baseline saved to {args.baseline}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
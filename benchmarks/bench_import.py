@@ -0,0 +1,84 @@
+"""
+Import-time benchmark for the core package.
+
+Each module is imported in a fresh interpreter (best of --repeat runs) and must
+not pull in ccxt, matplotlib or pandas. Exits non-zero when a module breaks the
+budget or imports a heavy dependency, so regressions show up in CI.
+
+    python benchmarks/bench_import.py [--budget-ms 250] [--json out.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    "core.exchange_client",
+    "core.market_data",
+    "core.execution",
+    "core.ndf_pricer",
+    "core.risk",
+    "core.microprice_simulator",
+    "core.monte_carlo",
+    "core.snapshot_store",
+    "core.ohlcv_cache",
+    "core.ttl_store",
+    "core.request_scheduler",
+    "core.l2_book",
+    "core.microprice",
+    "core.instrumentation",
+    "core.batch_report",
+    "core.ledger",
+    "core.returns",
+    "core.consolidated_book",
+    "core.pretrade_service",
+]
+HEAVY = ("ccxt", "matplotlib", "pandas")
+
+PROBE = """
+import sys, time, json
+t0 = time.perf_counter()
+import {module}
+dt = (time.perf_counter() - t0) * 1000.0
+print(json.dumps({{"ms": dt, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str, repeat: int) -> dict:
+    best, heavy = float("inf"), []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)],
+                             cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        res = json.loads(out.strip().splitlines()[-1])
+        best = min(best, res["ms"])
+        heavy = res["heavy"]
+    return {"module": module, "import_ms": round(best, 2), "heavy_imports": heavy}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=250.0, help="max import time per module")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    results = [measure(m, args.repeat) for m in MODULES]
+    failed = False
+    for r in results:
+        bad = r["import_ms"] > args.budget_ms or r["heavy_imports"]
+        failed |= bool(bad)
+        flag = "FAIL" if bad else "ok"
+        extra = f" (imports {', '.join(r['heavy_imports'])})" if r["heavy_imports"] else ""
+        print(f"{flag:4} {r['module']:28} {r['import_ms']:8.1f} ms{extra}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"budget_ms": args.budget_ms, "results": results}, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
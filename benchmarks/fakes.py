@@ -0,0 +1,59 @@
+"""
+Offline stand-ins for ccxt exchanges, used by the benchmarks for the polling paths.
+"""
+import time
+import numpy as np
+
+
+class FakeExchange:
+    """
+    Minimal ccxt-like exchange: fetch_order_book / fetch_ohlcv return synthetic
+    but well-formed data after an optional simulated network latency.
+    """
+
+    def __init__(self, mid: float = 87000.0, levels: int = 500, latency_s: float = 0.0, seed: int = 0,
+                 exchange_id: str = 'fake'):
+        self.id = exchange_id      # ccxt exchange id, used by ExchangeClient to pick the venue's scheduler
+        self.mid = mid
+        self.levels = levels
+        self.latency_s = latency_s
+        self.rng = np.random.default_rng(seed)
+        self.calls = 0
+
+    def _book(self, limit: int):
+        n = min(limit or self.levels, self.levels)
+        ticks = np.arange(n) * 0.5
+        sizes = self.rng.exponential(1.0, size=(2, n)).round(5)
+        bids = np.column_stack([self.mid - 0.25 - ticks, sizes[0]]).tolist()
+        asks = np.column_stack([self.mid + 0.25 + ticks, sizes[1]]).tolist()
+        return bids, asks
+
+    def fetch_order_book(self, symbol: str, limit: int = None):
+        self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        self.mid *= 1 + self.rng.normal(0, 1e-4)
+        bids, asks = self._book(limit)
+        return {'symbol': symbol, 'bids': bids, 'asks': asks,
+                'timestamp': int(time.time() * 1000), 'nonce': self.calls}
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str = '1h', since: int = None, limit: int = None):
+        self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        n = limit or 500
+        tf_ms = 3_600_000
+        now_ms = int(time.time() * 1000)
+        start = since if since is not None else (now_ms // tf_ms - n + 1) * tf_ms
+        n = max(0, min(n, (now_ms - start) // tf_ms + 1))   # like a real venue, nothing past now
+        if n == 0:
+            return []
+        close = self.mid * np.exp(np.cumsum(self.rng.normal(0, 0.005, n)))
+        ts = start + np.arange(n) * tf_ms
+        return np.column_stack([ts, close, close * 1.002, close * 0.998, close,
+                                self.rng.integers(1, 100, n)]).tolist()
+
+    @staticmethod
+    def parse_timeframe(timeframe: str) -> int:
+        units = {'m': 60, 'h': 3600, 'd': 86400}
+        return int(timeframe[:-1]) * units[timeframe[-1]]
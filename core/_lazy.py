@@ -0,0 +1,24 @@
+import importlib
+import sys
+import types
+
+
+class _LazyModule(types.ModuleType):
+    """Module stand-in that imports the real module on first attribute access."""
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__name__)
+        # later lookups hit the real module's namespace directly
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+def lazy_import(name: str):
+    """
+    Return `name` if it is already imported, otherwise a proxy that imports it
+    on first use. Keeps heavy optional dependencies (pandas, ccxt, matplotlib)
+    off the `import core.*` path.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return _LazyModule(name)
@@ -0,0 +1,287 @@
+"""
+Headless batch risk report over a book of positions.
+
+    python -m core.batch_report BTC/USDT=5.7 ETH/USDT=-40 BTC/USDT:USDT@perp=-2 --markdown
+    python -m core.batch_report --positions-file book.csv --workers 4 --metrics run.prom
+
+Positions are SYMBOL[@market]=QTY (market 'spot' or 'perp', default spot) or a
+CSV with columns symbol, qty[, market]. Market data for every instrument is
+fetched concurrently (one hourly OHLCV history from the OHLCV cache plus a
+top-of-book mid); VaR (250d, 60d, intraday 1h) and the stress grid are then
+computed per instrument, in a process pool with --workers > 1; an instrument
+whose data cannot be fetched or whose risk cannot be computed is logged and
+left out. Everything lands in one consolidated long-format table written once
+in a columnar format: Parquet when pyarrow or fastparquet is installed, else one
+array per column in a .npz (read back with read_report). --format picks one
+explicitly; csv is opt-in. An optional Markdown rendering goes next to it.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import logging
+import argparse
+import importlib.util
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from core._lazy import lazy_import
+from core import instrumentation as instr
+from core.ohlcv_cache import OHLCVCache, CLOSE
+from core.market_data import mid_from_order_book
+from core.risk import stress_grid
+from core.returns import Returns, DEFAULT_HORIZONS
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+log = logging.getLogger(__name__)
+
+REPORT_COLUMNS = ['Symbol', 'Market', 'Qty', 'Price', 'Notional', 'Metric', 'Value',
+                  'Shock', 'Fees', 'Volatility', 'Shocked Price', 'Net PnL']
+VAR_METRICS = tuple(DEFAULT_HORIZONS)
+STRESS_METRIC = 'Stress'
+FORMATS = ('auto', 'parquet', 'npz', 'csv')
+
+
+def parse_position(text: str):
+    """'BTC/USDT=5.7' or 'BTC/USDT:USDT@perp=-2' -> (symbol, market, qty)."""
+    try:
+        instrument, qty = text.rsplit('=', 1)
+        symbol, _, market = instrument.partition('@')
+        return symbol, market or 'spot', float(qty)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected SYMBOL[@market]=QTY, got {text!r}")
+
+
+def load_positions(path: str) -> list:
+    df = pd.read_csv(path)
+    markets = df['market'] if 'market' in df else ['spot'] * len(df)
+    return [(str(s), str(m), float(q)) for s, m, q in zip(df['symbol'], markets, df['qty'])]
+
+
+def net_positions(positions) -> list:
+    """Sum quantities per (symbol, market), keeping first-seen order."""
+    book = {}
+    for symbol, market, qty in positions:
+        book[(symbol, market)] = book.get((symbol, market), 0.0) + qty
+    return [(s, m, q) for (s, m), q in book.items()]
+
+
+def fetch_instruments(clients: dict, positions, cache: OHLCVCache, lookback_days: int = 250,
+                      book_limit: int = 5, max_workers: int = 8) -> dict:
+    """
+    Fetch hourly closes and one order book of `book_limit` levels for every
+    (symbol, market) concurrently. Returns {(symbol, market): (closes, order book)};
+    failed instruments are logged and left out.
+    """
+    def fetch(key):
+        symbol, market = key
+        client = clients[market]
+        closes = cache.ohlcv(client, symbol, timeframe='1h', limit=24 * lookback_days)[:, CLOSE]
+        return closes, client.order_book(symbol, limit=book_limit)
+
+    keys = list(dict.fromkeys((s, m) for s, m, _ in positions))
+    out = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(keys)))) as pool:
+        futures = {key: pool.submit(fetch, key) for key in keys}
+        for key, fut in futures.items():
+            try:
+                out[key] = fut.result()
+            except Exception as e:
+                instr.count('report.fetch_failed')
+                log.error(f"Skipping {key[0]} ({key[1]}): {e}")
+    return out
+
+
+def fetch_market_data(clients: dict, positions, cache: OHLCVCache, lookback_days: int = 250,
+                      max_workers: int = 8) -> dict:
+    """
+    Fetch hourly closes and a mid price for every (symbol, market) concurrently.
+    Returns {(symbol, market): (mid, closes)}; failed instruments are logged and left out.
+    """
+    out = {}
+    for key, (closes, ob) in fetch_instruments(clients, positions, cache, lookback_days,
+                                               max_workers=max_workers).items():
+        mid = mid_from_order_book(ob['bids'], ob['asks']) if ob['bids'] and ob['asks'] else closes[-1]
+        out[key] = (mid, closes)
+    return out
+
+
+def _instrument_risk(task) -> dict:
+    """Worker: VaR at the three horizons and the stress grid for one instrument."""
+    symbol, market, qty, price, closes, alpha, intraday_days, stress_kwargs = task
+    notional = abs(qty) * price
+    sign = 1.0 if qty >= 0 else -1.0                            # shorts lose on the upper tail
+    horizons = dict(DEFAULT_HORIZONS)
+    horizons[VAR_METRICS[2]] = (1, 24 * intraday_days)
+    var = Returns(closes).var_table(horizons, alpha, notional, sign=sign)
+    cube = stress_grid(price, position_qty=qty, layout='cube', **stress_kwargs)
+    return {'symbol': symbol, 'market': market, 'qty': qty, 'price': price,
+            'notional': notional, 'var': var, 'stress': cube.to_frame(with_position=False)}
+
+
+def compute_risk(market_data: dict, positions, alpha: float = 0.99, intraday_days: int = 30,
+                 n_workers: int = 1, stress_kwargs: dict = None) -> list:
+    """Risk per instrument; failures (e.g. too little history) are logged and left out, like failed fetches."""
+    tasks = [(s, m, q, *market_data[(s, m)], alpha, intraday_days, stress_kwargs or {})
+             for s, m, q in positions if (s, m) in market_data]
+    results = []
+
+    def collect(task, get):
+        try:
+            results.append(get())
+        except Exception as e:
+            instr.count('report.compute_failed')
+            log.error(f"Skipping {task[0]} ({task[1]}): risk computation failed: {e}")
+
+    if n_workers <= 1:
+        for task in tasks:
+            collect(task, lambda task=task: _instrument_risk(task))
+        return results
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        futures = [(task, pool.submit(_instrument_risk, task)) for task in tasks]
+        for task, fut in futures:
+            collect(task, fut.result)
+    return results
+
+
+def consolidate(results: list) -> pd.DataFrame:
+    """One long table: VaR rows then stress rows per instrument (the risk_full_*.csv layout plus instrument columns)."""
+    frames = []
+    for res in results:
+        ident = {'Symbol': res['symbol'], 'Market': res['market'], 'Qty': res['qty'],
+                 'Price': res['price'], 'Notional': res['notional']}
+        var = pd.DataFrame({'Metric': list(res['var']), 'Value': list(res['var'].values())})
+        stress = res['stress'].assign(Metric=STRESS_METRIC)
+        frames.append(pd.concat([var, stress], ignore_index=True).assign(**ident))
+    if not frames:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+    return pd.concat(frames, ignore_index=True)[REPORT_COLUMNS]
+
+
+def render_markdown(report: pd.DataFrame) -> str:
+    var = report[report['Metric'] != STRESS_METRIC]
+    stress = report[report['Metric'] == STRESS_METRIC]
+    keys = ['Symbol', 'Market', 'Qty', 'Price', 'Notional']
+    summary = var.pivot_table(index=keys, columns='Metric', values='Value', sort=False)
+    summary = summary.reindex(columns=list(VAR_METRICS)).reset_index()
+    worst = stress.groupby(['Symbol', 'Market'], sort=False)['Net PnL'].min().rename('Worst Stress PnL')
+    summary = summary.merge(worst.reset_index(), on=['Symbol', 'Market'], how='left')
+
+    sep = "\n\n" + "=" * 80 + "\n\n"
+    parts = [" Value at Risk Metrics\n" + summary.to_markdown(index=False, floatfmt=",.2f")]
+    for (symbol, market), grid in stress.groupby(['Symbol', 'Market'], sort=False):
+        cols = ['Shock', 'Fees', 'Volatility', 'Shocked Price', 'Net PnL']
+        parts.append(f" Stress Scenarios: {symbol} ({market})\n" + grid[cols].to_markdown(index=False))
+    return sep.join(parts) + "\n"
+
+
+def parquet_available() -> bool:
+    return any(importlib.util.find_spec(m) is not None for m in ('pyarrow', 'fastparquet'))
+
+
+def read_report(path: str) -> pd.DataFrame:
+    """Load a report written by write_report (.parquet, .npz or .csv)."""
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    if path.endswith('.npz'):
+        with np.load(path) as cols:
+            return pd.DataFrame({c: cols[c] for c in REPORT_COLUMNS})
+    return pd.read_csv(path)
+
+
+def write_report(report: pd.DataFrame, out_dir: str, fmt: str = 'auto', markdown: bool = False,
+                 stamp: str = None) -> list:
+    """
+    Write the consolidated report once; returns the paths written. fmt 'auto' is
+    Parquet when an engine is installed, else .npz columns.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"fmt must be one of {FORMATS}, got {fmt!r}")
+    if fmt == 'auto':
+        fmt = 'parquet' if parquet_available() else 'npz'
+    stamp = stamp or datetime.now(timezone.utc).strftime('%Y-%m-%d_%H-%M-%S')
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    with instr.span('report.write'):
+        base = os.path.join(out_dir, f"risk_batch_{stamp}")
+        if fmt == 'parquet':
+            report.to_parquet(f"{base}.parquet", index=False)   # needs pyarrow or fastparquet
+        elif fmt == 'npz':
+            cols = {c: report[c].to_numpy(dtype=float if pd.api.types.is_numeric_dtype(report[c]) else str)
+                    for c in REPORT_COLUMNS}
+            np.savez(f"{base}.npz", **cols)
+        else:
+            report.to_csv(f"{base}.csv", index=False)
+        paths.append(f"{base}.{fmt}")
+        if markdown:
+            with open(f"{base}.md", 'w') as f:
+                f.write(render_markdown(report))
+            paths.append(f"{base}.md")
+    return paths
+
+
+def run_batch(positions, clients: dict = None, cache: OHLCVCache = None, alpha: float = 0.99,
+              lookback_days: int = 250, intraday_days: int = 30, n_workers: int = 1,
+              fetch_workers: int = 8) -> pd.DataFrame:
+    """
+    Fetch, compute and consolidate. `clients` maps market type to an ExchangeClient
+    (created on demand); `cache` defaults to the on-disk OHLCVCache.
+    """
+    positions = net_positions(positions)
+    if clients is None:
+        from core.exchange_client import ExchangeClient
+        clients = {m: ExchangeClient(m) for m in dict.fromkeys(m for _, m, _ in positions)}
+    cache = cache if cache is not None else OHLCVCache()
+    with instr.span('report.fetch'):
+        data = fetch_market_data(clients, positions, cache, lookback_days, fetch_workers)
+    with instr.span('report.compute'):
+        results = compute_risk(data, positions, alpha, intraday_days, n_workers)
+    return consolidate(results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('positions', nargs='*', type=parse_position, help='SYMBOL[@market]=QTY')
+    parser.add_argument('--positions-file', help='CSV with columns symbol, qty[, market]')
+    parser.add_argument('--alpha', type=float, default=0.99)
+    parser.add_argument('--lookback-days', type=int, default=250)
+    parser.add_argument('--intraday-days', type=int, default=30)
+    parser.add_argument('--workers', type=int, default=1, help='processes for the risk computation')
+    parser.add_argument('--fetch-workers', type=int, default=8)
+    parser.add_argument('--out', default=os.path.join('data', 'reports'))
+    parser.add_argument('--format', choices=FORMATS, default='auto',
+                        help='auto: parquet if pyarrow/fastparquet is installed, else npz columns')
+    parser.add_argument('--markdown', action='store_true', help='also write a Markdown rendering')
+    parser.add_argument('--metrics', help='write stage timings to this .json or .prom file')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    positions = list(args.positions)
+    if args.positions_file:
+        positions += load_positions(args.positions_file)
+    if not positions:
+        parser.error("no positions given")
+    if args.metrics:
+        instr.enable()
+
+    report = run_batch(positions, alpha=args.alpha, lookback_days=args.lookback_days,
+                       intraday_days=args.intraday_days, n_workers=args.workers,
+                       fetch_workers=args.fetch_workers)
+    if report.empty:
+        log.error("No instrument could be priced; nothing written")
+        return 1
+    for path in write_report(report, args.out, args.format, args.markdown):
+        log.info(f"Wrote {path}")
+
+    if args.metrics:
+        if args.metrics.endswith('.json'):
+            instr.export_json(args.metrics)
+        else:
+            instr.export_prometheus(args.metrics)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+Consolidated order book across venues.
+
+Every venue's book is fetched concurrently on a long-lived thread pool (ccxt
+clients keep their HTTP sessions, so connections are reused between refreshes)
+and the per-venue sorted levels are merged into one array-backed book whose
+levels carry the index of the venue they rest on.
+
+    clients = make_venue_clients(["binance", "okx", "bybit"], market_types=("spot", "perp"))
+    with ConsolidatedBook(clients, {"binance:spot": "BTC/USDT", "binance:perp": "BTC/USDT:USDT", ...}) as cb:
+        cb.refresh()
+        cb.mid(), cb.spread(), cb.cumulative_depth('ask')
+"""
+from __future__ import annotations
+
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from core._lazy import lazy_import
+from core import instrumentation as instr
+from core.market_data import _fetch_book
+from core.snapshot_store import BID, ASK, PRICE, SIZE
+
+pd = lazy_import("pandas")
+
+log = logging.getLogger(__name__)
+
+LEVEL_DTYPE = np.dtype([('price', 'f8'), ('size', 'f8'), ('venue', 'i2')])
+
+
+def make_venue_clients(exchange_ids, market_types=("spot",), **kwargs) -> dict:
+    """{'<exchange>:<market>': ExchangeClient} for every exchange id and market type."""
+    from core.exchange_client import ExchangeClient
+    return {f"{ex}:{m}": ExchangeClient(m, exchange_id=ex, **kwargs) for ex in exchange_ids for m in market_types}
+
+
+def _levels(levels) -> np.ndarray:
+    a = np.asarray(levels, dtype=float)
+    return a[:, :2] if a.size else np.empty((0, 2))
+
+
+def merge_levels(books, side: int) -> np.ndarray:
+    """
+    k-way merge of per-venue sorted levels (best first) into one LEVEL_DTYPE array.
+
+    books : list of (bids, asks) (n, 2) arrays, one per venue, each sorted best-first
+    The concatenated runs are merged with a stable sort (timsort merges the k
+    pre-sorted runs in O(n log k)); equal prices keep venue order.
+    """
+    runs = [b[side] for b in books]
+    counts = np.array([len(r) for r in runs])
+    out = np.empty(counts.sum(), dtype=LEVEL_DTYPE)
+    if not len(out):
+        return out
+    lv = np.concatenate(runs)
+    venue = np.repeat(np.arange(len(runs), dtype=np.int16), counts)
+    key = -lv[:, PRICE] if side == BID else lv[:, PRICE]
+    order = np.argsort(key, kind='stable')
+    out['price'] = lv[order, PRICE]
+    out['size'] = lv[order, SIZE]
+    out['venue'] = venue[order]
+    return out
+
+
+class ConsolidatedBook:
+    """
+    Venue-tagged consolidated book.
+
+    clients : {venue label: ExchangeClient or raw ccxt-like client}
+    symbols : one symbol for every venue, or {venue label: symbol} (perp symbols differ per venue)
+    limit   : levels requested per venue
+
+    After refresh(), `bids` / `asks` are LEVEL_DTYPE arrays (price, size, venue index
+    into `venues`), best first. A venue that fails to answer keeps its previous book
+    (its age shows in `updated`) and the error is recorded in `errors`.
+    """
+
+    def __init__(self, clients: dict, symbols, limit: int = 500, max_workers: int = None):
+        self.clients = dict(clients)
+        self.venues = list(self.clients)
+        self.symbols = symbols if isinstance(symbols, dict) else {v: symbols for v in self.venues}
+        self.limit = limit
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or len(self.venues))
+        self._books = {}
+        self.updated = {}
+        self.errors = {}
+        self.bids = np.empty(0, dtype=LEVEL_DTYPE)
+        self.asks = np.empty(0, dtype=LEVEL_DTYPE)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    # --- update ---
+    def refresh(self) -> "ConsolidatedBook":
+        """Fetch every venue concurrently, then rebuild the consolidated book."""
+        with instr.span('book.fetch'):
+            futures = {v: self._pool.submit(_fetch_book, self.clients[v], self.symbols[v], self.limit)
+                       for v in self.venues}
+            for venue, fut in futures.items():
+                try:
+                    ob = fut.result()
+                except Exception as e:
+                    self.errors[venue] = str(e)
+                    instr.count('book.fetch_failed')
+                    log.warning(f"{venue}: order book fetch failed, keeping previous book: {e}")
+                    continue
+                self.errors.pop(venue, None)
+                self.update(venue, ob['bids'], ob['asks'])
+        self.merge()
+        return self
+
+    def update(self, venue: str, bids, asks):
+        """Replace one venue's levels (ccxt [[price, size], ...] lists or arrays); call merge() after."""
+        self._books[venue] = (_levels(bids), _levels(asks))
+        self.updated[venue] = time.time()
+
+    def merge(self):
+        with instr.span('book.merge'):
+            books = [self._books.get(v, (np.empty((0, 2)), np.empty((0, 2)))) for v in self.venues]
+            self.bids = merge_levels(books, BID)
+            self.asks = merge_levels(books, ASK)
+
+    # --- consumers ---
+    def best_bid(self) -> float:
+        return float(self.bids['price'][0]) if len(self.bids) else float('nan')
+
+    def best_ask(self) -> float:
+        return float(self.asks['price'][0]) if len(self.asks) else float('nan')
+
+    def mid(self) -> float:
+        return (self.best_bid() + self.best_ask()) / 2.0
+
+    def spread(self) -> float:
+        """Consolidated top spread; negative when venues are crossed."""
+        return self.best_ask() - self.best_bid()
+
+    def crossed(self) -> bool:
+        return self.spread() < 0
+
+    def _side(self, side: str) -> np.ndarray:
+        if side not in ('bid', 'ask'):
+            raise ValueError("side must be 'bid' or 'ask'")
+        return self.bids if side == 'bid' else self.asks
+
+    def cumulative_depth(self, side: str, depth: int = None, notional: bool = False) -> np.ndarray:
+        """Cumulative size (or quote notional) over the top `depth` consolidated levels."""
+        lv = self._side(side)[:depth]
+        return np.cumsum(lv['size'] * lv['price'] if notional else lv['size'])
+
+    def depth_by_venue(self, side: str, depth: int = None) -> dict:
+        """Resting size per venue within the top `depth` consolidated levels."""
+        lv = self._side(side)[:depth]
+        sizes = np.bincount(lv['venue'], weights=lv['size'], minlength=len(self.venues))
+        return dict(zip(self.venues, sizes.tolist()))
+
+    def as_order_book(self, depth: int = 50) -> dict:
+        """ccxt-like {'bids', 'asks'} view, so mid_from_order_book / depth_snapshot apply unchanged."""
+        return {'bids': np.column_stack([self.bids['price'][:depth], self.bids['size'][:depth]]).tolist(),
+                'asks': np.column_stack([self.asks['price'][:depth], self.asks['size'][:depth]]).tolist()}
+
+    def to_array(self, depth: int = 20) -> np.ndarray:
+        """(2, depth, 2) array in the SnapshotStore / depth_execute layout; missing levels are NaN."""
+        out = np.full((2, depth, 2), np.nan)
+        for side, lv in ((BID, self.bids[:depth]), (ASK, self.asks[:depth])):
+            out[side, :len(lv), PRICE] = lv['price']
+            out[side, :len(lv), SIZE] = lv['size']
+        return out
+
+    def depth_frame(self, depth: int = 20) -> pd.DataFrame:
+        """depth_snapshot layout (price, size, side) plus the venue label of each level."""
+        venues = np.asarray(self.venues, dtype=object)
+        frames = [pd.DataFrame({'price': lv['price'], 'size': lv['size'], 'side': label,
+                                'venue': venues[lv['venue']]})
+                  for label, lv in (('bid', self.bids[:depth]), ('ask', self.asks[:depth]))]
+        return pd.concat(frames, ignore_index=True)
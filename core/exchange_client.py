@@ -1,50 +1,82 @@
-import ccxt
 import time
 import logging
 from datetime import datetime
 
+import numpy as np
+
+from core._lazy import lazy_import
+from core.ttl_store import TTLStore, carry_store
+from core.request_scheduler import RequestScheduler
+from core.instrumentation import span
+
+ccxt = lazy_import("ccxt")
+
 log = logging.getLogger(__name__)
 
+FUNDING_TTL_S = 30.0
+FUNDING_HISTORY_TTL_S = 3600.0
+
+# ccxt defaultType for perpetual swaps; binance calls its USD-M perps 'future'
+PERP_DEFAULT_TYPE = {'binance': 'future'}
+
+# funding/mark/index caches per venue: binance keeps the shared carry_store
+_venue_stores = {'binance': carry_store}
+
+def venue_store(exchange_id: str) -> TTLStore:
+    """Process-wide funding store for one exchange (pair keys are only unique within a venue)."""
+    return _venue_stores.setdefault(exchange_id, TTLStore())
+
+def annualize_funding(rate: float, interval_hours: float = 8.0) -> float:
+    """Per-interval funding rate -> annualized rate (Binance pays every 8h)."""
+    return rate * (24.0 / interval_hours) * 365.0
+
 class ExchangeClient:
-    def __init__(self, market_type="spot", timeout=30000, retries=3, delay=2):
+    def __init__(self, market_type="spot", timeout=30000, retries=3, delay=2, store=None, scheduler=None,
+                 exchange_id=None, client=None):
         """
-        Initialize a Binance client with extended timeout and retry logic.
+        Initialize a ccxt client with extended timeout and retry logic.
         market_type: "spot" or "perp"
         timeout: request timeout in ms (default 30s)
         retries: number of retry attempts on timeout
-        delay: seconds to wait between retries
-        """
-        if market_type == "spot":
-            self.client = ccxt.binance({
-                'enableRateLimit': True,
-                'timeout': timeout
-            })
-        elif market_type == "perp":
-            self.client = ccxt.binance({
-                'options': {'defaultType': 'future'},
-                'enableRateLimit': True,
-                'timeout': timeout
-            })
-        else:
+        delay: base backoff in seconds (doubles per retry, with jitter)
+        scheduler: RequestScheduler shared by all clients of the exchange (default: the one for exchange_id)
+        store: TTLStore for funding/mark/index data (default: venue_store(exchange_id); carry_store for binance)
+        exchange_id: any ccxt exchange id, e.g. "binance", "okx", "bybit" (default "binance")
+        client: pre-built ccxt-like instance (e.g. a fake exchange in tests); skips construction.
+                Its venue comes from exchange_id or client.id, so each venue gets its own
+                scheduler and funding store; one of the two is required.
+        """
+        if market_type not in ("spot", "perp"):
             raise ValueError("market_type must be 'spot' or 'perp'")
-
+        if client is not None:
+            exchange_id = exchange_id or getattr(client, 'id', None)
+            if not exchange_id:
+                raise ValueError("pass exchange_id with an injected client that has no 'id'")
+        else:
+            exchange_id = exchange_id or "binance"
+            if not hasattr(ccxt, exchange_id):
+                raise ValueError(f"unknown ccxt exchange id: {exchange_id}")
+            config = {'enableRateLimit': True, 'timeout': timeout}
+            if market_type == "perp":
+                config['options'] = {'defaultType': PERP_DEFAULT_TYPE.get(exchange_id, 'swap')}
+            client = getattr(ccxt, exchange_id)(config)
+        self.client = client
+
+        self.exchange_id = exchange_id
+        self.market_type = market_type
         self.retries = retries
         self.delay = delay
+        self.store = store if store is not None else venue_store(exchange_id)
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler.for_exchange(exchange_id)
 
     def _retry_call(self, func, *args, **kwargs):
         """
-        Internal helper: wrap ccxt calls with retry logic.
+        Internal helper: run a ccxt call through the shared scheduler
+        (weight budget, backoff on timeouts and 429/418, request coalescing).
         """
-        for attempt in range(self.retries):
-            try:
-                return func(*args, **kwargs)
-            except ccxt.RequestTimeout:
-                log.warning(f"Timeout on {func.__name__} (attempt {attempt+1}/{self.retries})")
-                time.sleep(self.delay)
-            except Exception as e:
-                log.error(f"Unexpected error in {func.__name__}: {e}")
-                raise
-        raise RuntimeError(f"Failed {func.__name__} after {self.retries} retries")
+        with span(f"fetch.{getattr(func, '__name__', 'request')}"):
+            return self.scheduler.call(func, args, kwargs, market=self.market_type,
+                                       retries=self.retries, base_delay=self.delay)
 
     def order_book(self, pair: str, limit: int = 50):
         """
@@ -53,12 +85,75 @@ class ExchangeClient:
         """
         return self._retry_call(self.client.fetch_order_book, pair, limit)
 
-    def ohlcv(self, pair: str, timeframe: str = '1h', limit: int = 100):
+    def ohlcv(self, pair: str, timeframe: str = '1h', limit: int = 100, since: int = None):
         """
         Fetch OHLCV candles for a trading pair.
+        since: optional start timestamp in ms (for paginated backfills).
         Returns list of [timestamp, open, high, low, close, volume].
         """
-        return self._retry_call(self.client.fetch_ohlcv, pair, timeframe, limit)
+        return self._retry_call(self.client.fetch_ohlcv, pair, timeframe, since=since, limit=limit)
+
+    def _require_perp(self):
+        if self.market_type != "perp":
+            raise ValueError("funding data is only available on a perp client")
+
+    @staticmethod
+    def _funding_record(fr: dict) -> dict:
+        interval = fr.get('interval')
+        hours = float(interval[:-1]) if isinstance(interval, str) and interval.endswith('h') else 8.0
+        # a missing rate stays NaN rather than posing as zero carry
+        rate = fr.get('fundingRate')
+        rate = float('nan') if rate is None else float(rate)
+        return {
+            'funding_rate': rate,
+            'funding_annual': annualize_funding(rate, hours),
+            'mark': fr.get('markPrice'),
+            'index': fr.get('indexPrice'),
+            'next_funding_ts': fr.get('fundingTimestamp'),
+            'timestamp': fr.get('timestamp'),
+        }
+
+    def funding_rate(self, pair: str) -> dict:
+        """
+        Current funding rate plus mark/index price for a perp, cached in the store.
+        Returns dict with funding_rate, funding_annual, mark, index, next_funding_ts, timestamp.
+        """
+        self._require_perp()
+        return self.store.get_or_fetch(
+            ('funding', pair),
+            lambda: self._funding_record(self._retry_call(self.client.fetch_funding_rate, pair)),
+            FUNDING_TTL_S)
+
+    def funding_rates(self, pairs) -> dict:
+        """
+        Batch version of funding_rate: one request for every pair not already cached.
+        Returns {pair: record}.
+        """
+        self._require_perp()
+        pairs = list(pairs)
+        cached = self.store.get_many([('funding', p) for p in pairs])
+        out = {k[1]: v for k, v in cached.items()}
+        missing = [p for p in pairs if p not in out]
+        if missing:
+            fetched = self._retry_call(self.client.fetch_funding_rates, missing)
+            for p in missing:
+                if p not in fetched:
+                    log.warning(f"No funding rate returned for {p}")
+                    continue
+                rec = self._funding_record(fetched[p])
+                self.store.set(('funding', p), rec, FUNDING_TTL_S)
+                out[p] = rec
+        return out
+
+    def funding_history(self, pair: str, since: int = None, limit: int = 100) -> np.ndarray:
+        """
+        Historical funding payments as an (n, 2) array [timestamp ms, funding rate], cached in the store.
+        """
+        self._require_perp()
+        def fetch():
+            hist = self._retry_call(self.client.fetch_funding_rate_history, pair, since=since, limit=limit)
+            return np.array([[h['timestamp'], h.get('fundingRate')] for h in hist], dtype=float).reshape(-1, 2)
+        return self.store.get_or_fetch(('funding_history', pair, since, limit), fetch, FUNDING_HISTORY_TTL_S)
 
     def print_order_book(self, pair: str, limit: int = 5):
         """
@@ -1,7 +1,13 @@
+from __future__ import annotations
+
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
 from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+
+from core._lazy import lazy_import
+from core.instrumentation import timed
+
+pd = lazy_import("pandas")
 
 # --- Execution dataclass ---
 @dataclass
@@ -12,6 +18,7 @@ class ExecutionResult:
     schedule: pd.DataFrame
 
 # --- VWAP executor ---
+@timed("execution.vwap")
 def vwap_execute(prices: np.ndarray, volumes: np.ndarray, target_qty: float) -> ExecutionResult:
     weights = volumes / volumes.sum()
     schedule_qty = target_qty * weights
@@ -22,6 +29,7 @@ def vwap_execute(prices: np.ndarray, volumes: np.ndarray, target_qty: float) ->
     return ExecutionResult('VWAP', float(avg_price), float(slippage_bps), schedule)
 
 # --- TWAP executor ---
+@timed("execution.twap")
 def twap_execute(prices: np.ndarray, target_qty: float) -> ExecutionResult:
     n = len(prices)
     schedule_qty = np.full(n, target_qty / n)
@@ -31,30 +39,227 @@ def twap_execute(prices: np.ndarray, target_qty: float) -> ExecutionResult:
     schedule = pd.DataFrame({'price': prices, 'qty_exec': schedule_qty})
     return ExecutionResult('TWAP', float(avg_price), float(slippage_bps), schedule)
 
-# --- Simulated BTCUSD order book ---
-np.random.seed(42)
-prices = np.array([30000, 30100, 29950, 30050, 30200, 30150, 30080, 30120, 30060, 30100])
-volumes = np.array([2.5, 3.0, 1.8, 2.2, 2.9, 3.1, 2.0, 2.5, 1.9, 2.3])  # BTC traded per slice
-target_qty = 10  # BTC to buy
-
-# --- Run VWAP and TWAP ---
-vwap_res = vwap_execute(prices, volumes, target_qty)
-twap_res = twap_execute(prices, target_qty)
-
-# --- Display results ---
-print(f"VWAP Execution: Avg Price={vwap_res.avg_price:.2f}, Slippage={vwap_res.slippage_bps:.2f} bps")
-print(vwap_res.schedule, "\n")
-
-print(f"TWAP Execution: Avg Price={twap_res.avg_price:.2f}, Slippage={twap_res.slippage_bps:.2f} bps")
-print(twap_res.schedule, "\n")
-
-# --- Plot execution schedules ---
-plt.figure(figsize=(12,6))
-plt.plot(vwap_res.schedule['qty_exec'].cumsum(), vwap_res.schedule['price'], marker='o', label='VWAP')
-plt.plot(twap_res.schedule['qty_exec'].cumsum(), twap_res.schedule['price'], marker='x', label='TWAP')
-plt.xlabel('Cumulative BTC Executed')
-plt.ylabel('Price (USD)')
-plt.title('VWAP vs TWAP Execution Schedule')
-plt.legend()
-plt.grid(True)
-plt.show()
+# --- Batched strategy sweep ---
+SWEEP_COLUMNS = ['path', 'algorithm', 'notional', 'n_slices', 'participation', 'qty', 'filled_qty',
+                 'avg_price', 'slippage_bps', 'shortfall_bps', 'max_participation']
+
+def _sweep_block(args) -> dict:
+    """Sweep one block of paths; returns a dict of flat result columns."""
+    prices, volumes, path_ids, notionals, schedule_lengths, participation_rates = args
+    n_paths = prices.shape[0]
+    notionals = np.asarray(notionals, dtype=float)
+    rates = np.asarray(participation_rates, dtype=float)
+    out = {c: [] for c in SWEEP_COLUMNS}
+
+    def emit(algorithm, n, participation, qty, filled, avg, bench, arrival, max_part):
+        # all arrays broadcast to (n_paths, n_notionals)
+        shape = (n_paths, len(notionals))
+        out['path'].append(np.broadcast_to(path_ids[:, None], shape).ravel())
+        out['algorithm'].append(np.full(shape[0] * shape[1], algorithm, dtype=object))
+        out['notional'].append(np.broadcast_to(notionals, shape).ravel())
+        out['n_slices'].append(np.full(shape[0] * shape[1], n))
+        out['participation'].append(np.full(shape[0] * shape[1], participation))
+        out['qty'].append(np.broadcast_to(qty, shape).ravel())
+        out['filled_qty'].append(np.broadcast_to(filled, shape).ravel())
+        out['avg_price'].append(np.broadcast_to(avg, shape).ravel())
+        out['slippage_bps'].append(np.broadcast_to((avg - bench) / bench * 10000, shape).ravel())
+        out['shortfall_bps'].append(np.broadcast_to((avg - arrival) / arrival * 10000, shape).ravel())
+        out['max_participation'].append(np.broadcast_to(max_part, shape).ravel())
+
+    for n in schedule_lengths:
+        p = prices[:, :n]
+        v = volumes[:, :n]
+        arrival = p[:, :1]                                   # (P, 1)
+        qty = notionals / arrival                            # (P, N)
+        vol_sum = v.sum(axis=1, keepdims=True)
+        vwap_bench = (p * v).sum(axis=1, keepdims=True) / vol_sum
+        twap_bench = p.mean(axis=1, keepdims=True)
+
+        # VWAP: child qty proportional to volume, so avg price equals the window VWAP
+        emit('VWAP', n, np.nan, qty, qty, vwap_bench, vwap_bench, arrival,
+             qty / vol_sum)
+        # TWAP: equal child qty
+        emit('TWAP', n, np.nan, qty, qty, twap_bench, twap_bench, arrival,
+             (qty / n) / v.min(axis=1, keepdims=True))
+        # POV: trade rate * market volume each slice until the parent is done
+        for rate in rates:
+            cum_cap = rate * np.cumsum(v, axis=1)                            # (P, n)
+            cum_exec = np.minimum(cum_cap[:, None, :], qty[:, :, None])     # (P, N, n)
+            child = np.diff(cum_exec, axis=2, prepend=0.0)
+            filled = cum_exec[:, :, -1]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                avg = (child * p[:, None, :]).sum(axis=2) / filled
+            emit('POV', n, rate, qty, filled, avg, vwap_bench, arrival, rate)
+
+    return {c: np.concatenate(vals) for c, vals in out.items()}
+
+@timed("execution.sweep")
+def execution_sweep(prices: np.ndarray, volumes: np.ndarray, notionals,
+                    schedule_lengths=None, participation_rates=(0.05, 0.1, 0.2),
+                    n_workers: int = 1, paths_per_task: int = 1000) -> pd.DataFrame:
+    """
+    Sweep VWAP, TWAP and POV schedules over stacked price/volume paths.
+
+    prices, volumes     : (n_paths, n_steps) arrays, or 1-D for a single path
+    notionals           : parent notionals in quote currency; qty = notional / arrival price
+    schedule_lengths    : numbers of slices to execute over (first n steps of each path);
+                          defaults to the full path
+    participation_rates : POV rates (child qty = rate * slice volume until filled)
+    n_workers           : >1 splits paths into blocks of paths_per_task across a process pool
+
+    VWAP/TWAP rows match vwap_execute/twap_execute (slippage vs their own benchmark);
+    shortfall_bps is measured against the arrival price. One DataFrame is built at the
+    end instead of a schedule DataFrame per run.
+    """
+    prices = np.atleast_2d(np.asarray(prices, dtype=float))
+    volumes = np.atleast_2d(np.asarray(volumes, dtype=float))
+    if prices.shape != volumes.shape:
+        raise ValueError("prices and volumes must have the same shape")
+    if schedule_lengths is None:
+        schedule_lengths = (prices.shape[1],)
+    if max(schedule_lengths) > prices.shape[1]:
+        raise ValueError("schedule length exceeds the number of price steps")
+    notionals = np.atleast_1d(np.asarray(notionals, dtype=float))
+
+    path_ids = np.arange(prices.shape[0])
+    tasks = [(prices[i:i + paths_per_task], volumes[i:i + paths_per_task], path_ids[i:i + paths_per_task],
+              notionals, tuple(schedule_lengths), tuple(participation_rates))
+             for i in range(0, prices.shape[0], paths_per_task)]
+    if n_workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            blocks = list(pool.map(_sweep_block, tasks))
+    else:
+        blocks = [_sweep_block(t) for t in tasks]
+
+    return pd.DataFrame({c: np.concatenate([b[c] for b in blocks]) for c in SWEEP_COLUMNS})
+
+# --- Depth-aware execution ---
+@dataclass
+class DepthExecutionResult:
+    algorithm: str
+    avg_price: np.ndarray         # (n_orders,)
+    slippage_bps: np.ndarray      # (n_orders,) vs arrival mid, positive = cost
+    slice_qty: np.ndarray         # (n_orders, n_slices)
+    slice_avg_price: np.ndarray   # (n_orders, n_slices)
+    slice_impact_bps: np.ndarray  # (n_orders, n_slices) vs each slice's own mid, positive = cost
+    exhausted: np.ndarray         # (n_orders, n_slices) True where a slice ran past the visible book
+
+def _prepare_side(books: np.ndarray, side: int):
+    """Per-slice level prices (NaN padding forward-filled), cumulative size and cumulative notional."""
+    px = books[:, side, :, 0]
+    sz = np.nan_to_num(books[:, side, :, 1])
+    valid = ~np.isnan(px)
+    idx = np.where(valid, np.arange(px.shape[1]), 0)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    px = np.take_along_axis(px, idx, axis=1)
+    return px, np.cumsum(sz, axis=1), np.cumsum(px * sz, axis=1)
+
+def _notional_to(px, cum, cum_notional, x):
+    """Notional needed to take x (per order) from the top of one slice's book."""
+    k = np.minimum(np.searchsorted(cum, x, side='left'), len(cum) - 1)
+    prev_cum = np.where(k > 0, cum[k - 1], 0.0)
+    prev_notional = np.where(k > 0, cum_notional[k - 1], 0.0)
+    return prev_notional + (x - prev_cum) * px[k]
+
+@timed("execution.depth")
+def depth_execute(books: np.ndarray, target_qty, volumes=None, side: str = 'buy',
+                  replenish: float = 1.0, n_slices: int = None) -> DepthExecutionResult:
+    """
+    Execute VWAP (volumes given) or TWAP child orders against L2 books.
+
+    books      : (n_slices, 2, depth, 2) books, one per slice, in the SnapshotStore
+                 layout [side (bid, ask), level, (price, size)], or a single
+                 (2, depth, 2) book reused for every slice (then pass volumes or n_slices)
+    target_qty : scalar or (n_orders,) parent quantities, evaluated as one batch
+    volumes    : (n_slices,) or (n_orders, n_slices) volume profile for VWAP weights
+    side       : 'buy' walks the asks, 'sell' walks the bids
+    replenish  : fraction of consumed depth restored before the next slice
+                 (1.0 = every slice sees a fresh book, 0.0 = no refill)
+
+    Each slice's cost is found with searchsorted over precomputed cumulative size
+    and notional arrays; the batch is vectorized, with a loop only over slices.
+    """
+    if side not in ('buy', 'sell'):
+        raise ValueError("side must be 'buy' or 'sell'")
+    books = np.asarray(books, dtype=float)
+    if books.ndim == 3:
+        if n_slices is None:
+            if volumes is None:
+                raise ValueError("pass volumes or n_slices with a single book")
+            n_slices = np.shape(volumes)[-1]
+        books = np.broadcast_to(books, (n_slices,) + books.shape)
+    n_slices = books.shape[0]
+
+    qty = np.atleast_1d(np.asarray(target_qty, dtype=float))
+    if volumes is None:
+        weights = np.full((1, n_slices), 1.0 / n_slices)
+        algorithm = 'TWAP'
+    else:
+        vol = np.atleast_2d(np.asarray(volumes, dtype=float))
+        weights = vol / vol.sum(axis=1, keepdims=True)
+        algorithm = 'VWAP'
+    slice_qty = qty[:, None] * weights
+    if slice_qty.shape[1] != n_slices:
+        raise ValueError("volumes length must match the number of books")
+
+    sign = 1.0 if side == 'buy' else -1.0
+    px, cum, cum_notional = _prepare_side(books, 1 if side == 'buy' else 0)
+    mids = (books[:, 0, 0, 0] + books[:, 1, 0, 0]) / 2.0
+
+    slice_notional = np.empty_like(slice_qty)
+    exhausted = np.empty(slice_qty.shape, dtype=bool)
+    consumed = np.zeros(slice_qty.shape[0])
+    for s in range(n_slices):
+        start = _notional_to(px[s], cum[s], cum_notional[s], consumed)
+        end_qty = consumed + slice_qty[:, s]
+        slice_notional[:, s] = _notional_to(px[s], cum[s], cum_notional[s], end_qty) - start
+        exhausted[:, s] = end_qty > cum[s, -1]
+        consumed = (1.0 - replenish) * end_qty
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slice_avg = slice_notional / slice_qty
+    avg_price = slice_notional.sum(axis=1) / slice_qty.sum(axis=1)
+    return DepthExecutionResult(
+        algorithm=algorithm,
+        avg_price=avg_price,
+        slippage_bps=sign * (avg_price - mids[0]) / mids[0] * 10000,
+        slice_qty=slice_qty,
+        slice_avg_price=slice_avg,
+        slice_impact_bps=sign * (slice_avg - mids) / mids * 10000,
+        exhausted=exhausted,
+    )
+
+# --- Demo (python -m core.execution) ---
+def demo():
+    import matplotlib.pyplot as plt
+
+    # --- Simulated BTCUSD order book ---
+    np.random.seed(42)
+    prices = np.array([30000, 30100, 29950, 30050, 30200, 30150, 30080, 30120, 30060, 30100])
+    volumes = np.array([2.5, 3.0, 1.8, 2.2, 2.9, 3.1, 2.0, 2.5, 1.9, 2.3])  # BTC traded per slice
+    target_qty = 10  # BTC to buy
+
+    # --- Run VWAP and TWAP ---
+    vwap_res = vwap_execute(prices, volumes, target_qty)
+    twap_res = twap_execute(prices, target_qty)
+
+    # --- Display results ---
+    print(f"VWAP Execution: Avg Price={vwap_res.avg_price:.2f}, Slippage={vwap_res.slippage_bps:.2f} bps")
+    print(vwap_res.schedule, "\n")
+
+    print(f"TWAP Execution: Avg Price={twap_res.avg_price:.2f}, Slippage={twap_res.slippage_bps:.2f} bps")
+    print(twap_res.schedule, "\n")
+
+    # --- Plot execution schedules ---
+    plt.figure(figsize=(12,6))
+    plt.plot(vwap_res.schedule['qty_exec'].cumsum(), vwap_res.schedule['price'], marker='o', label='VWAP')
+    plt.plot(twap_res.schedule['qty_exec'].cumsum(), twap_res.schedule['price'], marker='x', label='TWAP')
+    plt.xlabel('Cumulative BTC Executed')
+    plt.ylabel('Price (USD)')
+    plt.title('VWAP vs TWAP Execution Schedule')
+    plt.legend()
+    plt.grid(True)
+    plt.show()
+
+if __name__ == "__main__":
+    demo()
@@ -0,0 +1,228 @@
+"""
+Per-stage timers and counters for the risk pipeline.
+
+Disabled by default: timed() wrappers and span() then cost one attribute check.
+Turn on with enable() (or profile_run() for a single run) and export with
+export_json() / export_prometheus().
+
+    from core import instrumentation as instr
+    instr.enable()
+    ... run ...
+    instr.export_prometheus("metrics.prom")
+
+Stage names are dotted, e.g. 'fetch.fetch_order_book', 'var.historical',
+'stress.grid', 'execution.vwap', 'report.write'.
+"""
+import json
+import time
+import logging
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+SAMPLES = 1024          # recent durations kept per stage for quantiles
+PROM_PREFIX = 'crs'
+
+
+class Registry:
+    """Thread-safe store of stage timings and event counters."""
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._stages = {}       # stage -> [count, total_s, max_s, deque(samples)]
+        self._counters = {}
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            st = self._stages.get(stage)
+            if st is None:
+                st = self._stages[stage] = [0, 0.0, 0.0, deque(maxlen=SAMPLES)]
+            st[0] += 1
+            st[1] += seconds
+            st[2] = max(st[2], seconds)
+            st[3].append(seconds)
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+
+    def snapshot(self) -> dict:
+        """{'stages': {stage: {count, total_s, mean_ms, p50_ms, p99_ms, max_ms}}, 'counters': {...}}"""
+        with self._lock:
+            stages = {k: (v[0], v[1], v[2], np.array(v[3])) for k, v in self._stages.items()}
+            counters = dict(self._counters)
+        out = {}
+        for stage, (n, total, mx, samples) in sorted(stages.items()):
+            out[stage] = {
+                'count': n,
+                'total_s': total,
+                'mean_ms': total / n * 1000.0,
+                'p50_ms': float(np.percentile(samples, 50)) * 1000.0,
+                'p99_ms': float(np.percentile(samples, 99)) * 1000.0,
+                'max_ms': mx * 1000.0,
+            }
+        return {'stages': out, 'counters': dict(sorted(counters.items()))}
+
+
+registry = Registry()
+
+
+def enable():
+    registry.enabled = True
+
+
+def disable():
+    registry.enabled = False
+
+
+def is_enabled() -> bool:
+    return registry.enabled
+
+
+def count(name: str, n: int = 1):
+    """Increment an event counter (no-op while disabled)."""
+    if registry.enabled:
+        registry.count(name, n)
+
+
+class _Span:
+    __slots__ = ('stage', 't0')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        registry.observe(self.stage, time.perf_counter() - self.t0)
+        if exc_type is not None:
+            registry.count(f"{self.stage}.errors")
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(stage: str):
+    """Context manager timing a block under `stage`."""
+    return _Span(stage) if registry.enabled else _NULL_SPAN
+
+
+def timed(stage: str):
+    """Decorator timing every call of a function under `stage`; failures also count '<stage>.errors'."""
+    def deco(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return func(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except BaseException:
+                registry.count(f"{stage}.errors")
+                raise
+            finally:
+                registry.observe(stage, time.perf_counter() - t0)
+        return wrapper
+    return deco
+
+
+# --- export ---
+def export_json(path: str) -> dict:
+    snap = registry.snapshot()
+    with open(path, 'w') as f:
+        json.dump(snap, f, indent=2)
+    return snap
+
+
+def prometheus_text(prefix: str = PROM_PREFIX) -> str:
+    """Prometheus text exposition: one summary per stage, one counter per event."""
+    snap = registry.snapshot()
+    lines = [f"# HELP {prefix}_stage_seconds Time spent per pipeline stage",
+             f"# TYPE {prefix}_stage_seconds summary"]
+    for stage, s in snap['stages'].items():
+        lbl = f'stage="{stage}"'
+        lines.append(f'{prefix}_stage_seconds{{{lbl},quantile="0.5"}} {s["p50_ms"] / 1000.0:.9g}')
+        lines.append(f'{prefix}_stage_seconds{{{lbl},quantile="0.99"}} {s["p99_ms"] / 1000.0:.9g}')
+        lines.append(f'{prefix}_stage_seconds_sum{{{lbl}}} {s["total_s"]:.9g}')
+        lines.append(f'{prefix}_stage_seconds_count{{{lbl}}} {s["count"]}')
+    lines += [f"# HELP {prefix}_events_total Pipeline event counters",
+              f"# TYPE {prefix}_events_total counter"]
+    for name, n in snap['counters'].items():
+        lines.append(f'{prefix}_events_total{{name="{name}"}} {n}')
+    return "\n".join(lines) + "\n"
+
+
+def export_prometheus(path: str, prefix: str = PROM_PREFIX) -> str:
+    text = prometheus_text(prefix)
+    with open(path, 'w') as f:
+        f.write(text)
+    return text
+
+
+# --- one-off capture ---
+@contextmanager
+def profile_run(out_prefix: str, cprofile: bool = True, memory: bool = False, top: int = 30):
+    """
+    Capture one run: stage metrics are enabled for the block and written to
+    <out_prefix>_metrics.json; with cprofile the raw profile goes to <out_prefix>.prof
+    and the top functions by cumulative time to <out_prefix>_profile.txt; with
+    memory the top tracemalloc allocation sites and the peak go to <out_prefix>_memory.txt.
+    """
+    was_enabled = registry.enabled
+    enable()
+    prof = None
+    if memory:
+        import tracemalloc
+        tracemalloc.start()
+    if cprofile:
+        import cProfile
+        prof = cProfile.Profile()
+        prof.enable()
+    try:
+        yield registry
+    finally:
+        if prof is not None:
+            import io
+            import pstats
+            prof.disable()
+            prof.dump_stats(f"{out_prefix}.prof")
+            buf = io.StringIO()
+            pstats.Stats(prof, stream=buf).sort_stats('cumulative').print_stats(top)
+            with open(f"{out_prefix}_profile.txt", 'w') as f:
+                f.write(buf.getvalue())
+        if memory:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            with open(f"{out_prefix}_memory.txt", 'w') as f:
+                f.write(f"peak {peak / 1e6:.2f} MB\n")
+                for stat in snapshot.statistics('lineno')[:top]:
+                    f.write(f"{stat}\n")
+        export_json(f"{out_prefix}_metrics.json")
+        if not was_enabled:
+            disable()
+        log.info(f"Profile written to {out_prefix}_*")
@@ -0,0 +1,312 @@
+import json
+import logging
+from bisect import bisect_left
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+class SequenceGap(Exception):
+    """A diff update does not follow the book's last update id; the book needs a resync."""
+
+
+class _Side:
+    """
+    One side of the book as a blocked sorted map (keys ascending), the layout of
+    core.risk._SortedWindow without its rank tree: keys are split into blocks of
+    at most 2 * LOAD, with parallel size blocks and a list of block maxima.
+    Bids are keyed by -price so both sides share the same best-first order.
+
+    set() is a binary search over the block maxima and one inside a short block;
+    inserting or removing a level shifts that block only, O(log n + LOAD), instead
+    of the whole side. Top-of-book reads walk the first block(s).
+    """
+    LOAD = 256
+    __slots__ = ('sign', '_keys', '_sizes', '_maxes', '_len')
+
+    def __init__(self, sign: float):
+        self.sign = sign
+        self.clear()
+
+    def __len__(self):
+        return self._len
+
+    def clear(self):
+        self._keys = []
+        self._sizes = []
+        self._maxes = []
+        self._len = 0
+
+    def _split(self, b: int):
+        keys, sizes = self._keys[b], self._sizes[b]
+        self._keys.insert(b + 1, keys[self.LOAD:])
+        self._sizes.insert(b + 1, sizes[self.LOAD:])
+        self._maxes.insert(b + 1, keys[-1])
+        del keys[self.LOAD:]
+        del sizes[self.LOAD:]
+        self._maxes[b] = keys[-1]
+
+    def set(self, price: float, size: float):
+        key = self.sign * price
+        maxes = self._maxes
+        b = bisect_left(maxes, key)
+        if b == len(maxes):                     # past the last level: append
+            if size == 0.0:
+                return
+            if not maxes:
+                self._keys.append([key])
+                self._sizes.append([size])
+                maxes.append(key)
+                self._len = 1
+                return
+            b -= 1
+            self._keys[b].append(key)
+            self._sizes[b].append(size)
+            maxes[b] = key
+        else:
+            keys, sizes = self._keys[b], self._sizes[b]
+            i = bisect_left(keys, key)
+            if keys[i] == key:
+                if size != 0.0:
+                    sizes[i] = size
+                    return
+                del keys[i]
+                del sizes[i]
+                self._len -= 1
+                if not keys:
+                    del self._keys[b]
+                    del self._sizes[b]
+                    del maxes[b]
+                elif i == len(keys):
+                    maxes[b] = keys[-1]
+                return
+            if size == 0.0:
+                return
+            keys.insert(i, key)
+            sizes.insert(i, size)
+        self._len += 1
+        if len(self._keys[b]) > 2 * self.LOAD:
+            self._split(b)
+
+    def best(self) -> float:
+        return self.sign * self._keys[0][0] if self._keys else float('nan')
+
+    def levels(self, depth: int = None) -> list:
+        depth = self._len if depth is None else min(depth, self._len)
+        s, out = self.sign, []
+        for keys, sizes in zip(self._keys, self._sizes):
+            if len(out) >= depth:
+                break
+            out.extend([s * k, q] for k, q in zip(keys[:depth - len(out)], sizes))
+        return out
+
+    def sizes(self, depth: int = None) -> list:
+        depth = self._len if depth is None else min(depth, self._len)
+        out = []
+        for sizes in self._sizes:
+            if len(out) >= depth:
+                break
+            out.extend(sizes[:depth - len(out)])
+        return out
+
+
+class L2Book:
+    """
+    Local L2 order book maintained from a snapshot plus diff updates.
+
+    Updates follow the Binance diff-depth convention: each event carries the
+    first ('U') and last ('u') update id it covers and 'b'/'a' lists of
+    [price, size] (size 0 removes the level). Events already covered by the
+    book are skipped; an event that starts past last_update_id + 1 raises
+    SequenceGap so the caller can resync from a fresh snapshot.
+
+    Level updates are O(log n) (see _Side); bids()/asks() return ccxt-style
+    [[price, size], ...] for the top `depth` levels only, so mid_from_order_book
+    and depth_snapshot can consume them directly.
+    """
+
+    def __init__(self, symbol: str = None):
+        self.symbol = symbol
+        self._bids = _Side(-1.0)
+        self._asks = _Side(1.0)
+        self.last_update_id = None
+        self.synced = False
+
+    def apply_snapshot(self, bids, asks, last_update_id: int):
+        self._bids.clear()
+        self._asks.clear()
+        for p, s in bids:
+            self._bids.set(float(p), float(s))
+        for p, s in asks:
+            self._asks.set(float(p), float(s))
+        self.last_update_id = int(last_update_id)
+        self.synced = True
+
+    def apply_diff(self, event: dict) -> bool:
+        """Apply one diff event. Returns False if it was stale, raises SequenceGap on a gap."""
+        if not self.synced:
+            raise SequenceGap("book has no snapshot")
+        first, last = int(event['U']), int(event['u'])
+        if last <= self.last_update_id:
+            return False
+        if first > self.last_update_id + 1:
+            self.synced = False
+            raise SequenceGap(f"{self.symbol}: expected update {self.last_update_id + 1}, got {first}")
+        for p, s in event.get('b', ()):
+            self._bids.set(float(p), float(s))
+        for p, s in event.get('a', ()):
+            self._asks.set(float(p), float(s))
+        self.last_update_id = last
+        return True
+
+    # --- consumers ---
+    def bids(self, depth: int = None) -> list:
+        return self._bids.levels(depth)
+
+    def asks(self, depth: int = None) -> list:
+        return self._asks.levels(depth)
+
+    def best_bid(self) -> float:
+        return self._bids.best()
+
+    def best_ask(self) -> float:
+        return self._asks.best()
+
+    def mid(self) -> float:
+        return (self.best_bid() + self.best_ask()) / 2.0
+
+    def spread(self) -> float:
+        return self.best_ask() - self.best_bid()
+
+    def cumulative_depth(self, side: str, depth: int = None) -> np.ndarray:
+        """Cumulative size over the top `depth` levels of 'bid' or 'ask'."""
+        s = self._bids if side == 'bid' else self._asks
+        return np.cumsum(s.sizes(depth))
+
+    def as_order_book(self, depth: int = 50) -> dict:
+        """ccxt-like {'bids', 'asks', 'nonce'} view of the top levels."""
+        return {'bids': self.bids(depth), 'asks': self.asks(depth), 'nonce': self.last_update_id}
+
+    def to_array(self, depth: int = 20) -> np.ndarray:
+        """(2, depth, 2) array in the SnapshotStore / depth_execute layout."""
+        from core.snapshot_store import book_array
+        return book_array(self.bids(depth), self.asks(depth), depth)
+
+
+class RecordedDiffFeed:
+    """
+    Feed that replays a recorded JSON-lines file:
+        {"type": "snapshot", "lastUpdateId": ..., "bids": [...], "asks": [...]}
+        {"type": "diff", "U": ..., "u": ..., "b": [...], "a": [...]}
+    snapshot() returns the latest snapshot seen so far in the file, like a
+    REST snapshot taken while the stream was running; run_book only uses it
+    once it is recent enough to bridge a gap.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._latest_snapshot = None
+
+    def events(self):
+        with open(self.path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                msg = json.loads(line)
+                if msg.get('type') == 'snapshot':
+                    self._latest_snapshot = msg
+                    continue
+                yield msg
+
+    def snapshot(self) -> dict:
+        if self._latest_snapshot is None:
+            # the file's first snapshot precedes every diff
+            with open(self.path) as f:
+                for line in f:
+                    msg = json.loads(line) if line.strip() else {}
+                    if msg.get('type') == 'snapshot':
+                        self._latest_snapshot = msg
+                        break
+        if self._latest_snapshot is None:
+            raise ValueError(f"no snapshot recorded in {self.path}")
+        return self._latest_snapshot
+
+    @staticmethod
+    def record(path: str, messages):
+        """Write snapshot/diff messages (dicts with a 'type' key) as JSON lines."""
+        with open(path, 'w') as f:
+            for msg in messages:
+                f.write(json.dumps(msg) + '\n')
+
+
+class CallableFeed:
+    """
+    Adapter for any live source: `events` is an iterable of diff events and
+    `snapshot` a callable returning {'lastUpdateId', 'bids', 'asks'} (e.g. wrapping
+    ExchangeClient.order_book, whose ccxt 'nonce' is Binance's lastUpdateId).
+    """
+
+    def __init__(self, events, snapshot):
+        self._events = events
+        self._snapshot = snapshot
+
+    def events(self):
+        return iter(self._events)
+
+    def snapshot(self) -> dict:
+        return self._snapshot()
+
+
+def run_book(feed, book: L2Book = None, on_update=None, max_resyncs: int = 10) -> L2Book:
+    """
+    Drive an L2Book from a feed (RecordedDiffFeed, CallableFeed or anything with
+    events()/snapshot()). on_update(book) is called after every applied diff.
+
+    On a sequence gap at event (U, u) the book waits for a snapshot with
+    lastUpdateId >= U - 1: diffs arriving meanwhile are dropped, feed.snapshot()
+    is retried on each of them (a live feed refetches, a recording advances to
+    its next snapshot), and once one is fresh enough the diffs continue under
+    the usual U/u rule, stale ones being skipped. More than max_resyncs gaps,
+    or a feed that ends before a fresh snapshot, raises SequenceGap.
+    """
+    book = book if book is not None else L2Book()
+    resyncs = 0
+    need = None     # while out of sync: minimum lastUpdateId a usable snapshot must have
+
+    def resync(min_id: int = None) -> bool:
+        snap = feed.snapshot()
+        if min_id is not None and int(snap['lastUpdateId']) < min_id:
+            return False
+        book.apply_snapshot(snap['bids'], snap['asks'], snap['lastUpdateId'])
+        return True
+
+    resync()
+    for event in feed.events():
+        if need is not None:
+            if not resync(need):
+                continue
+            log.info(f"{book.symbol}: resynced at update {book.last_update_id}")
+            need = None
+        try:
+            applied = book.apply_diff(event)
+        except SequenceGap as e:
+            resyncs += 1
+            if resyncs > max_resyncs:
+                raise
+            log.warning(f"{e}; waiting for a snapshot at or after {int(event['U']) - 1} "
+                        f"({resyncs}/{max_resyncs})")
+            need = int(event['U']) - 1
+            if not resync(need):
+                continue
+            need = None
+            try:
+                applied = book.apply_diff(event)
+            except SequenceGap:
+                need = int(event['U']) - 1
+                continue
+        if applied and on_update is not None:
+            on_update(book)
+    if need is not None and not resync(need):
+        raise SequenceGap(f"{book.symbol}: feed ended before a snapshot at or after update {need}")
+    return book
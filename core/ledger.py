@@ -0,0 +1,194 @@
+"""
+Position ledger with incremental realized/unrealized PnL.
+
+Fills are applied one at a time in O(1) (average cost) or amortized O(1)
+(FIFO: every lot is pushed once and consumed once). Per-symbol state lives in
+growable NumPy arrays indexed by symbol id, so a whole book is marked against
+a price vector in one vectorized step.
+"""
+import numpy as np
+
+from core.risk import PnLReport
+
+METHODS = ("fifo", "average")
+
+
+def _grow(arr: np.ndarray, n: int) -> np.ndarray:
+    """Return arr with capacity for at least n rows (doubling), zero-filled."""
+    if n <= len(arr):
+        return arr
+    out = np.zeros(max(n, 2 * len(arr)), dtype=arr.dtype)
+    out[:len(arr)] = arr
+    return out
+
+
+class _LotQueue:
+    """FIFO queue of open lots (signed qty, price) in growable arrays consumed from a head index."""
+    __slots__ = ('prices', 'qtys', 'head', 'tail')
+
+    def __init__(self, capacity: int = 16):
+        self.prices = np.empty(capacity)
+        self.qtys = np.empty(capacity)
+        self.head = 0
+        self.tail = 0
+
+    def push(self, price: float, qty: float):
+        if self.tail == len(self.qtys):
+            live = self.tail - self.head
+            if self.head >= live:
+                # more consumed slots than live lots: compact instead of growing
+                self.prices[:live] = self.prices[self.head:self.tail]
+                self.qtys[:live] = self.qtys[self.head:self.tail]
+            else:
+                self.prices = _grow(self.prices[self.head:self.tail], 2 * len(self.qtys))
+                self.qtys = _grow(self.qtys[self.head:self.tail], 2 * len(self.qtys))
+            self.head, self.tail = 0, live
+        self.prices[self.tail] = price
+        self.qtys[self.tail] = qty
+        self.tail += 1
+
+    def close(self, qty: float):
+        """
+        Consume up to |qty| from the oldest lots (qty has the opposite sign of the lots).
+        Returns (closed signed lot qty, cost of the closed lots, unmatched remainder of qty).
+        """
+        closed = cost = 0.0
+        remaining = qty
+        while remaining != 0.0 and self.head < self.tail:
+            lot = self.qtys[self.head]
+            take = lot if abs(lot) <= abs(remaining) else -remaining
+            closed += take
+            cost += take * self.prices[self.head]
+            remaining += take
+            if take == lot:
+                self.head += 1
+            else:
+                self.qtys[self.head] = lot - take
+        if self.head == self.tail:
+            self.head = self.tail = 0
+        return closed, cost, remaining
+
+
+class Ledger:
+    """
+    Multi-symbol trade ledger.
+
+    method   : 'fifo' (oldest lots close first) or 'average' (average cost)
+    Buys are positive qty, sells negative; a fill larger than the open position
+    closes it and opens the remainder on the other side. Fees are per fill, in
+    quote currency, and are deducted from realized PnL.
+
+    Per-symbol state (aligned with `symbols`):
+        position, open_cost (signed cost of the open position), realized, fees
+    """
+
+    def __init__(self, method: str = "fifo", capacity: int = 64):
+        if method not in METHODS:
+            raise ValueError(f"method must be one of {METHODS}")
+        self.method = method
+        self.symbols = []
+        self._ids = {}
+        self.position = np.zeros(capacity)
+        self.open_cost = np.zeros(capacity)
+        self.realized = np.zeros(capacity)
+        self.fees = np.zeros(capacity)
+        self._lots = []
+        self.n_fills = 0
+
+    def symbol_id(self, symbol: str) -> int:
+        sid = self._ids.get(symbol)
+        if sid is None:
+            sid = self._ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+            n = len(self.symbols)
+            self.position = _grow(self.position, n)
+            self.open_cost = _grow(self.open_cost, n)
+            self.realized = _grow(self.realized, n)
+            self.fees = _grow(self.fees, n)
+            self._lots.append(_LotQueue() if self.method == "fifo" else None)
+        return sid
+
+    def add_fill(self, symbol: str, price: float, qty: float, fee: float = 0.0):
+        sid = self.symbol_id(symbol)
+        price, qty = float(price), float(qty)
+        self.n_fills += 1
+        if fee:
+            self.fees[sid] += fee
+            self.realized[sid] -= fee
+        if qty == 0.0:
+            return
+        pos = self.position[sid]
+
+        if self.method == "fifo":
+            lots = self._lots[sid]
+            remaining = qty
+            if pos != 0.0 and (pos > 0) != (qty > 0):
+                closed, cost, remaining = lots.close(qty)
+                # closing `closed` lot units at `price`: PnL = price * closed - cost
+                self.realized[sid] += price * closed - cost
+                self.open_cost[sid] -= cost
+            if remaining != 0.0:
+                lots.push(price, remaining)
+                self.open_cost[sid] += price * remaining
+            self.position[sid] = pos + qty
+            return
+
+        # average cost
+        new_pos = pos + qty
+        if pos == 0.0 or (pos > 0) == (qty > 0):
+            self.open_cost[sid] += price * qty
+        else:
+            avg = self.open_cost[sid] / pos
+            closed = -qty if abs(qty) <= abs(pos) else pos
+            self.realized[sid] += (price - avg) * closed
+            if new_pos == 0.0:
+                self.open_cost[sid] = 0.0
+            elif (new_pos > 0) == (pos > 0):
+                self.open_cost[sid] = avg * new_pos
+            else:
+                self.open_cost[sid] = price * new_pos   # flipped: remainder opened at the fill price
+        self.position[sid] = new_pos
+
+    def add_fills(self, symbols, prices, qtys, fees=None):
+        """Apply a block of fills in order; `symbols` may be one symbol for the whole block."""
+        prices = np.asarray(prices, dtype=float)
+        qtys = np.asarray(qtys, dtype=float)
+        fees = np.zeros(len(qtys)) if fees is None else np.broadcast_to(np.asarray(fees, dtype=float), qtys.shape)
+        if isinstance(symbols, str):
+            symbols = [symbols] * len(qtys)
+        add = self.add_fill
+        for s, p, q, f in zip(symbols, prices.tolist(), qtys.tolist(), fees.tolist()):
+            add(s, p, q, f)
+
+    def avg_cost(self) -> np.ndarray:
+        """Average entry price of each open position (NaN when flat)."""
+        n = len(self.symbols)
+        pos = self.position[:n]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(pos != 0.0, self.open_cost[:n] / pos, np.nan)
+
+    def mark(self, prices, symbols=None) -> PnLReport:
+        """
+        Mark positions against prices. `prices` is a dict symbol -> price, or a
+        vector aligned with `symbols` (default: self.symbols). Returns a PnLReport
+        whose fields are arrays aligned with those symbols. Symbols never traded
+        are reported flat and are not added to the ledger.
+        """
+        symbols = list(self.symbols) if symbols is None else list(symbols)
+        if isinstance(prices, dict):
+            prices = [prices[s] for s in symbols]
+        px = np.asarray(prices, dtype=float)
+        ids = np.array([self._ids.get(s, -1) for s in symbols], dtype=np.int64)
+        known = ids >= 0
+        pos, cost, realized = np.zeros(len(ids)), np.zeros(len(ids)), np.zeros(len(ids))
+        pos[known] = self.position[ids[known]]
+        cost[known] = self.open_cost[ids[known]]
+        realized[known] = self.realized[ids[known]]
+        unreal = px * pos - cost
+        return PnLReport(realized=realized, unrealized=unreal, total=realized + unreal, inventory=pos)
+
+    def report(self, symbol: str, price: float) -> PnLReport:
+        """Scalar PnLReport for one symbol."""
+        r = self.mark([price], [symbol])
+        return PnLReport(realized=float(r.realized[0]), unrealized=float(r.unrealized[0]),
+                         total=float(r.total[0]), inventory=float(r.inventory[0]))
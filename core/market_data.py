@@ -1,10 +1,22 @@
+from __future__ import annotations
+
 import time
-import pandas as pd
-import ccxt
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from core._lazy import lazy_import
+
+pd = lazy_import("pandas")
+ccxt = lazy_import("ccxt")
 
-# Initialise clients
-spot = ccxt.binance()
-futures = ccxt.binance({'options': {'defaultType': 'future'}})
+log = logging.getLogger(__name__)
+
+# Clients are created on demand, not at import
+def make_clients():
+    """Return (spot, futures) ccxt Binance clients."""
+    spot = ccxt.binance()
+    futures = ccxt.binance({'options': {'defaultType': 'future'}})
+    return spot, futures
 
 # Utility functions
 def mid_from_order_book(bids, asks) -> float:
@@ -29,11 +41,19 @@ def depth_snapshot(bids, asks, depth: int = 20) -> pd.DataFrame:
     return pd.concat([bid_df, ask_df], ignore_index=True)
 
 # --- Single-market polling(spot) ---
+def _ts_ms(ts) -> int:
+    return int(ts.value // 1_000_000)
+
 def poll_order_book(client, symbol: str,
-                    limit: int = 50, n: int = 10, sleep_s: float = 1.0) -> pd.DataFrame:
+                    limit: int = 50, n: int = 10, sleep_s: float = 1.0, store=None,
+                    on_tick=None, market: str = 'spot') -> pd.DataFrame:
     """
     Poll a single market's order book n times and compute mid and spread.
     Returns a DataFrame with timestamp, mid, spread.
+    store: optional SnapshotStore that receives the full depth of every poll.
+    on_tick: optional callback called with each row dict as it arrives
+             (e.g. LiveForwardBoard.on_tick); like every polling path, the row
+             passed to it also carries 'market' (this market label) and 'symbol'.
     """
     #Updated to fix NaT values
     rows = []
@@ -41,11 +61,15 @@ def poll_order_book(client, symbol: str,
         ob = client.fetch_order_book(symbol, limit=limit)
         ts_raw = ob.get('timestamp')
         ts = pd.to_datetime(ts_raw, unit='ms') if ts_raw else pd.Timestamp.utcnow()
+        if store is not None:
+            store.append(symbol, ob['bids'], ob['asks'], _ts_ms(ts))
         rows.append({
             'timestamp': ts,
             'mid': mid_from_order_book(ob['bids'], ob['asks']),
             'spread': spread_top(ob['bids'], ob['asks'])
         })
+        if on_tick is not None:
+            on_tick({**rows[-1], 'market': market, 'symbol': symbol})
         time.sleep(sleep_s)
     return pd.DataFrame(rows)
 
@@ -70,39 +94,131 @@ def poll_order_book(client, symbol: str,
 
 # --- Dual-market polling (spot + perp) ---
 def poll_order_books(spot_client, futures_client, symbol: str,
-                     limit: int = 50, n: int = 10, sleep_s: float = 1.0) -> pd.DataFrame:
+                     limit: int = 50, n: int = 10, sleep_s: float = 1.0,
+                     concurrent: bool = False, store=None,
+                     on_tick=None) -> pd.DataFrame:
     """
     Poll both Spot and Futures order books n times and compute mid and spread at each snapshot.
     Returns a combined DataFrame with market labels and valid timestamps.
+    concurrent=True fetches spot and perp at the same time on a fixed sleep_s cadence
+    (see poll_order_books_concurrent).
+    store: optional SnapshotStore; books are keyed 'spot:<symbol>' and 'perp:<symbol>'.
+    on_tick: optional callback called with each row dict (including 'market' and 'symbol') as it arrives.
     """
+    if concurrent:
+        df = poll_order_books_concurrent({'spot': spot_client, 'perp': futures_client}, [symbol],
+                                         limit=limit, n=n, interval_s=sleep_s, store=store,
+                                         on_tick=on_tick)
+        return df[['timestamp', 'market', 'mid', 'spread']]
+
     rows = []
     for _ in range(n):
         # Spot
         ob_spot = spot_client.fetch_order_book(symbol, limit=limit)
         ts_spot_raw = ob_spot.get('timestamp')
         ts_spot = pd.to_datetime(ts_spot_raw, unit='ms') if ts_spot_raw else pd.Timestamp.utcnow()
+        if store is not None:
+            store.append(f'spot:{symbol}', ob_spot['bids'], ob_spot['asks'], _ts_ms(ts_spot))
         rows.append({
             'timestamp': ts_spot,
             'market': 'spot',
             'mid': mid_from_order_book(ob_spot['bids'], ob_spot['asks']),
             'spread': spread_top(ob_spot['bids'], ob_spot['asks'])
         })
+        if on_tick is not None:
+            on_tick({**rows[-1], 'symbol': symbol})
 
         # Perp
         ob_perp = futures_client.fetch_order_book(symbol, limit=limit)
         ts_perp_raw = ob_perp.get('timestamp')
         ts_perp = pd.to_datetime(ts_perp_raw, unit='ms') if ts_perp_raw else pd.Timestamp.utcnow()
+        if store is not None:
+            store.append(f'perp:{symbol}', ob_perp['bids'], ob_perp['asks'], _ts_ms(ts_perp))
         rows.append({
             'timestamp': ts_perp,
             'market': 'perp',
             'mid': mid_from_order_book(ob_perp['bids'], ob_perp['asks']),
             'spread': spread_top(ob_perp['bids'], ob_perp['asks'])
         })
+        if on_tick is not None:
+            on_tick({**rows[-1], 'symbol': symbol})
 
         time.sleep(sleep_s)
 
     return pd.DataFrame(rows)
 
+def _fetch_book(client, symbol: str, limit: int):
+    # accept raw ccxt clients as well as ExchangeClient
+    if hasattr(client, 'fetch_order_book'):
+        return client.fetch_order_book(symbol, limit=limit)
+    return client.order_book(symbol, limit=limit)
+
+def poll_order_books_concurrent(clients: dict, symbols, limit: int = 50, n: int = 10,
+                                interval_s: float = 1.0, max_workers: int = None,
+                                store=None, on_tick=None) -> pd.DataFrame:
+    """
+    Poll every (market, symbol) pair at once on each tick.
+
+    clients    : mapping market label -> client, e.g. {'spot': spot, 'perp': futures}
+    symbols    : symbols fetched from every client
+    interval_s : fixed cadence between tick starts; time spent fetching is deducted,
+                 and ticks that overrun skip the missed slots instead of drifting
+
+    Every row of one tick shares the same 'timestamp' (local UTC clock at tick start),
+    so spot/perp rows are contemporaneous. The exchange's own time is kept in
+    'exchange_timestamp' and the request round trip in 'latency_ms'.
+    store: optional SnapshotStore; full depth is appended under '<market>:<symbol>'
+    with the shared tick timestamp.
+    on_tick: optional callback called with each row dict as it arrives.
+    Returns a DataFrame with timestamp, market, symbol, mid, spread, exchange_timestamp, latency_ms.
+    """
+    cols = ['timestamp', 'market', 'symbol', 'mid', 'spread', 'exchange_timestamp', 'latency_ms']
+    jobs = [(market, client, sym) for market, client in clients.items() for sym in symbols]
+    rows = []
+    if not jobs:
+        return pd.DataFrame(rows, columns=cols)
+
+    def fetch(job):
+        market, client, sym = job
+        t0 = time.perf_counter()
+        ob = _fetch_book(client, sym, limit)
+        latency_ms = (time.perf_counter() - t0) * 1000.0
+        ts_raw = ob.get('timestamp')
+        return {
+            'market': market,
+            'symbol': sym,
+            'mid': mid_from_order_book(ob['bids'], ob['asks']),
+            'spread': spread_top(ob['bids'], ob['asks']),
+            'exchange_timestamp': pd.to_datetime(ts_raw, unit='ms') if ts_raw else pd.NaT,
+            'latency_ms': latency_ms,
+        }, ob
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(jobs)) as pool:
+        start = time.monotonic()
+        for i in range(n):
+            tick_ts = pd.Timestamp.now(tz='UTC').tz_localize(None)
+            for row, ob in pool.map(fetch, jobs):
+                row['timestamp'] = tick_ts
+                rows.append(row)
+                if store is not None:
+                    store.append(f"{row['market']}:{row['symbol']}", ob['bids'], ob['asks'], _ts_ms(tick_ts))
+                if on_tick is not None:
+                    on_tick(row)
+            if i == n - 1:
+                break
+            if interval_s <= 0:
+                continue
+            now = time.monotonic()
+            next_tick = start + (i + 1) * interval_s
+            if now > next_tick:
+                missed = int((now - next_tick) // interval_s) + 1
+                log.warning(f"Polling tick {i} overran the {interval_s}s cadence, skipping {missed} slot(s)")
+                start += missed * interval_s
+                next_tick += missed * interval_s
+            time.sleep(max(0.0, next_tick - now))
+
+    return pd.DataFrame(rows, columns=cols)
+
 # def poll_order_books(spot_client, futures_client, symbol: str,
 #                      limit: int = 50, n: int = 100, sleep_s: float = 0.5) -> pd.DataFrame:
 #     """
@@ -138,6 +254,7 @@ def poll_order_books(spot_client, futures_client, symbol: str,
 #     return pd.DataFrame(rows)
 
 # Example usage
+# spot, futures = make_clients()
 # symbol = 'BTCUSDT'
 # combined_data = poll_order_books(spot, futures, symbol, limit=50, n=5, sleep_s=0.5)
 # print(combined_data)
@@ -0,0 +1,129 @@
+"""
+Fair-value estimators from L2 depth.
+
+All functions take books in the SnapshotStore layout, shape
+(n, 2, depth, 2) = [time, side (bid, ask), level, (price, size)],
+e.g. the memmaps returned by SnapshotStore.load, and return (n,) series.
+A single (2, depth, 2) book is treated as n = 1.
+"""
+
+import numpy as np
+
+from core.snapshot_store import BID, ASK, PRICE, SIZE, book_array
+
+
+def _as_books(books) -> np.ndarray:
+    books = np.asarray(books, dtype=float)
+    return books[None] if books.ndim == 3 else books
+
+
+def stack_books(order_books, depth: int = 20) -> np.ndarray:
+    """List of ccxt order book dicts -> (n, 2, depth, 2) array."""
+    return np.stack([book_array(ob['bids'], ob['asks'], depth) for ob in order_books])
+
+
+def mid(books) -> np.ndarray:
+    b = _as_books(books)
+    return (b[:, BID, 0, PRICE] + b[:, ASK, 0, PRICE]) / 2.0
+
+
+def spread(books) -> np.ndarray:
+    b = _as_books(books)
+    return b[:, ASK, 0, PRICE] - b[:, BID, 0, PRICE]
+
+
+def imbalance(books, levels: int = 1) -> np.ndarray:
+    """Bid share of resting size over the top `levels` levels: Qb / (Qb + Qa), in [0, 1]."""
+    b = _as_books(books)
+    qb = np.nansum(b[:, BID, :levels, SIZE], axis=1)
+    qa = np.nansum(b[:, ASK, :levels, SIZE], axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return qb / (qb + qa)
+
+
+def weighted_mid(books) -> np.ndarray:
+    """
+    Imbalance-weighted mid from the top level: I * ask + (1 - I) * bid.
+    Leans toward the side with less resting size, where the next move is likelier.
+    """
+    b = _as_books(books)
+    i = imbalance(b, 1)
+    return i * b[:, ASK, 0, PRICE] + (1.0 - i) * b[:, BID, 0, PRICE]
+
+
+def depth_weighted_mid(books, levels: int = 5) -> np.ndarray:
+    """
+    Depth-weighted fair price over the top `levels` levels: the size-weighted
+    price of each side, combined with weights given by the opposite side's depth
+    (same lean as weighted_mid, but using the whole visible book).
+    """
+    b = _as_books(books)[:, :, :levels]
+    px = b[..., PRICE]
+    sz = np.nan_to_num(b[..., SIZE])
+    q = sz.sum(axis=2)                                    # (n, 2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vw = np.nansum(px * sz, axis=2) / q               # (n, 2) side VWAPs
+        return (vw[:, BID] * q[:, ASK] + vw[:, ASK] * q[:, BID]) / (q[:, BID] + q[:, ASK])
+
+
+def _bucket(imb: np.ndarray, n_buckets: int) -> np.ndarray:
+    return np.clip((np.nan_to_num(imb, nan=0.5) * n_buckets).astype(np.int64), 0, n_buckets - 1)
+
+
+def stoikov_adjustment(books, horizon: int = 1, n_buckets: int = 10, window: int = None,
+                       levels: int = 1) -> np.ndarray:
+    """
+    Stoikov-style microprice adjustment g(I) in units of the spread, so that
+    microprice = mid + spread * g(I).
+
+    g is the mean future mid move over `horizon` snapshots, divided by the
+    spread, conditional on the imbalance bucket. With `window` set, the
+    estimate at t uses only pairs completed by t within the last `window`
+    snapshots (causal, rolling); otherwise the whole sample is used (in-sample).
+    Buckets with no history yet give 0.
+    """
+    if horizon < 1:
+        raise ValueError("horizon must be at least 1 snapshot")
+    b = _as_books(books)
+    m, s = mid(b), spread(b)
+    bucket = _bucket(imbalance(b, levels), n_buckets)
+    n = len(m)
+    if horizon >= n:
+        raise ValueError(f"horizon ({horizon}) must be smaller than the number of snapshots ({n})")
+    x = np.zeros(n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x[:n - horizon] = (m[horizon:] - m[:-horizon]) / s[:-horizon]
+    valid = np.zeros(n, dtype=bool)
+    valid[:n - horizon] = np.isfinite(x[:n - horizon])
+    x[~valid] = 0.0
+
+    g = np.zeros(n)
+    if window is None:
+        for k in range(n_buckets):
+            sel = valid & (bucket == k)
+            if sel.any():
+                g[bucket == k] = x[sel].mean()
+        return g
+
+    # causal rolling: pair s is known at s + horizon; at time t use s in [t-horizon-window+1, t-horizon]
+    t = np.arange(n)
+    hi = np.clip(t - horizon + 1, 0, n)
+    lo = np.clip(t - horizon - window + 1, 0, n)
+    for k in range(n_buckets):
+        at = bucket == k
+        if not at.any():
+            continue
+        mk = valid & (bucket == k)
+        csum = np.concatenate(([0.0], np.cumsum(np.where(mk, x, 0.0))))
+        ccnt = np.concatenate(([0], np.cumsum(mk)))
+        cnt = ccnt[hi[at]] - ccnt[lo[at]]
+        tot = csum[hi[at]] - csum[lo[at]]
+        g[at] = np.where(cnt > 0, tot / np.maximum(cnt, 1), 0.0)
+    return g
+
+
+def stoikov_microprice(books, horizon: int = 1, n_buckets: int = 10, window: int = None,
+                       levels: int = 1) -> np.ndarray:
+    """mid + spread * g(I), with g from stoikov_adjustment."""
+    b = _as_books(books)
+    return mid(b) + spread(b) * stoikov_adjustment(b, horizon, n_buckets, window, levels)
@@ -1,7 +1,175 @@
+import time
 import numpy as np
 
+from core._lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+MODELS = ("normal", "gbm", "t", "bootstrap")
+
 def microprice_path(mid: float, n: int = 60, sigma_bp: float = 30, seed: int = 42):
     rng = np.random.default_rng(seed)
     shocks = rng.normal(0, sigma_bp/10000.0, size=n) # random shocks in decimal
     path = mid * (1 + shocks).cumprod() # cumulative product simulates price evolution
     return path
+
+def calibrate_shocks(closes) -> dict:
+    """
+    Estimate per-step shock parameters from a close price series (e.g. the
+    OHLCV closes we already fetch). Returns kwargs for simulate_paths:
+    sigma_bp, mu (per-step drift, decimal), dof (Student-t degrees of freedom
+    from excess kurtosis) and returns (the simple returns, for bootstrapping).
+    """
+    closes = np.asarray(closes, dtype=float)
+    rets = closes[1:] / closes[:-1] - 1
+    rets = rets[~np.isnan(rets)]
+    sigma = rets.std(ddof=1)
+    z = (rets - rets.mean()) / sigma
+    excess_kurt = (z ** 4).mean() - 3.0
+    # t(dof) has excess kurtosis 6/(dof-4); fall back to a thin tail if returns look normal
+    dof = 4.0 + 6.0 / excess_kurt if excess_kurt > 0 else 30.0
+    return {"sigma_bp": float(sigma * 10000.0), "mu": float(rets.mean()), "dof": float(dof), "returns": rets}
+
+METHODS = ("plain", "antithetic", "sobol")
+
+def _uniforms_sobol(rng, shape, dtype):
+    import warnings
+    from scipy.stats import qmc
+    n, d = shape
+    engine = qmc.Sobol(d=d, scramble=True, seed=rng)
+    with warnings.catch_warnings():
+        # balance properties are best at powers of two, but any n is a valid RQMC sample
+        warnings.simplefilter("ignore", UserWarning)
+        u = engine.random(n)
+    # keep away from 0/1 so the inverse CDF stays finite
+    return np.clip(u, 1e-12, 1 - 1e-12).astype(dtype, copy=False)
+
+def _standard_shocks(rng, shape, method: str, dtype, dof: float = None):
+    """Unit-variance normal (dof=None) or Student-t(dof) shocks drawn with the given sampling method."""
+    if method == "sobol":
+        from scipy import stats
+        u = _uniforms_sobol(rng, shape, np.float64)
+        z = stats.norm.ppf(u) if dof is None else stats.t.ppf(u, dof)
+        return z.astype(dtype, copy=False)
+    if method == "antithetic":
+        half = (shape[0] + 1) // 2
+        z = _standard_shocks(rng, (half,) + tuple(shape[1:]), "plain", dtype, dof)
+        return np.concatenate([z, -z])[:shape[0]]
+    if method != "plain":
+        raise ValueError(f"method must be one of {METHODS}")
+    if dof is None:
+        return rng.standard_normal(shape, dtype=dtype)
+    return rng.standard_t(dof, size=shape).astype(dtype, copy=False)
+
+def _growth_factors(rng, shape, model: str = "normal", sigma_bp: float = 30, mu: float = 0.0,
+                    dof: float = 4.0, returns=None, method: str = "plain", dtype=np.float64) -> np.ndarray:
+    """Per-step gross returns (1 + r) of the given shape."""
+    dtype = np.dtype(dtype)
+    sigma = dtype.type(sigma_bp / 10000.0)
+    mu = dtype.type(mu)
+    if model == "normal":
+        return 1 + mu + sigma * _standard_shocks(rng, shape, method, dtype)
+    if model == "gbm":
+        return np.exp((mu - sigma ** 2 / 2) + sigma * _standard_shocks(rng, shape, method, dtype))
+    if model == "t":
+        if dof <= 2:
+            raise ValueError("dof must be > 2 for a finite variance")
+        scale = sigma / dtype.type(np.sqrt(dof / (dof - 2)))  # unit variance before scaling
+        return 1 + mu + scale * _standard_shocks(rng, shape, method, dtype, dof)
+    if model == "bootstrap":
+        if returns is None or len(returns) == 0:
+            raise ValueError("bootstrap model needs historical returns")
+        returns = np.asarray(returns, dtype=dtype)
+        if method == "antithetic":
+            raise ValueError("antithetic sampling needs a symmetric model, not bootstrap")
+        if method == "sobol":
+            idx = (_uniforms_sobol(rng, shape, np.float64) * len(returns)).astype(np.int64)
+        else:
+            idx = rng.integers(0, len(returns), size=shape)
+        return 1 + returns[idx]
+    raise ValueError(f"model must be one of {MODELS}")
+
+def simulate_paths(mid: float, n_paths: int = 1000, n_steps: int = 60, sigma_bp: float = 30,
+                   seed: int = 42, model: str = "normal", mu: float = 0.0, dof: float = 4.0,
+                   returns=None, rng=None, method: str = "plain", dtype=np.float64) -> np.ndarray:
+    """
+    Batched version of microprice_path: an (n_paths, n_steps) price matrix in one call.
+
+    model  : "normal" (same shocks as microprice_path), "gbm" (log-normal),
+             "t" (Student-t shocks scaled to sigma_bp) or "bootstrap"
+             (resampled from `returns`, e.g. calibrate_shocks(closes)["returns"])
+    method : "plain", "antithetic" (paired +/- shocks) or "sobol"
+             (scrambled Sobol points through the inverse CDF, one dimension per step)
+    dtype  : np.float32 halves memory and time for very large path counts
+    rng    : optional np.random.Generator; overrides seed
+
+    With model="normal", method="plain" and n_paths=1 the path equals
+    microprice_path(mid, n_steps, sigma_bp, seed).
+    """
+    rng = rng if rng is not None else np.random.default_rng(seed)
+    growth = _growth_factors(rng, (n_paths, n_steps), model, sigma_bp, mu, dof, returns, method, dtype)
+    return growth.dtype.type(mid) * growth.cumprod(axis=1)
+
+def control_variate(y, x, x_mean: float):
+    """
+    Control-variate estimate of E[y] using x with known mean x_mean.
+    Returns (estimate, standard error).
+    """
+    y = np.asarray(y, dtype=float)
+    x = np.asarray(x, dtype=float)
+    xc = x - x.mean()
+    beta = (xc * (y - y.mean())).sum() / (xc * xc).sum()
+    adj = y - beta * (x - x_mean)
+    return float(adj.mean()), float(adj.std(ddof=1) / np.sqrt(len(adj)))
+
+def expected_terminal(mid: float, n_steps: int, model: str = "normal", mu: float = 0.0, returns=None) -> float:
+    """Analytical E[S_T] for simulate_paths, used as the control-variate mean."""
+    if model == "gbm":
+        return mid * float(np.exp(mu * n_steps))
+    if model == "bootstrap":
+        return mid * float((1 + np.mean(returns)) ** n_steps)
+    return mid * (1 + mu) ** n_steps
+
+def convergence_report(mid: float = 100.0, n_steps: int = 60, sigma_bp: float = 30, alpha: float = 0.99,
+                       path_counts=(1024, 4096, 16384, 65536), methods=METHODS, n_reps: int = 20,
+                       model: str = "normal", mu: float = 0.0, dof: float = 4.0, returns=None,
+                       dtype=np.float64, seed: int = 42):
+    """
+    Compare estimator error against path count for each sampling method.
+
+    For every (method, n_paths) the simulation is repeated n_reps times with
+    independent SeedSequence streams; the spread of the estimates across reps is the
+    error. Two statistics are tracked:
+      var  : the alpha quantile loss of the terminal return (VaR per unit notional)
+      twap : the mean path price (expected TWAP fill), plain and with the terminal
+             price as control variate (twap_cv)
+    Returns a DataFrame with estimate/std per statistic, ci95 widths, seconds and
+    the path-matrix size in MB.
+    """
+    ex_terminal = expected_terminal(mid, n_steps, model, mu, returns)
+    rows = []
+    for method in methods:
+        for n in path_counts:
+            seeds = np.random.SeedSequence(seed).spawn(n_reps)
+            var_est, twap_est, twap_cv = [], [], []
+            t0 = time.perf_counter()
+            for ss in seeds:
+                paths = simulate_paths(mid, n, n_steps, sigma_bp, model=model, mu=mu, dof=dof,
+                                       returns=returns, rng=np.random.default_rng(ss), method=method, dtype=dtype)
+                term = paths[:, -1].astype(float)
+                ret = term / mid - 1
+                k = int((1 - alpha) * n)
+                var_est.append(-np.partition(ret, k)[k])
+                twap = paths.mean(axis=1, dtype=float)
+                twap_est.append(twap.mean())
+                twap_cv.append(control_variate(twap, term, ex_terminal)[0])
+            secs = (time.perf_counter() - t0) / n_reps
+            row = {"method": method, "n_paths": n, "seconds": secs,
+                   "matrix_mb": n * n_steps * np.dtype(dtype).itemsize / 1e6}
+            for name, vals in (("var", var_est), ("twap", twap_est), ("twap_cv", twap_cv)):
+                vals = np.asarray(vals)
+                row[f"{name}_estimate"] = vals.mean()
+                row[f"{name}_std"] = vals.std(ddof=1)
+                row[f"{name}_ci95"] = 2 * 1.96 * vals.std(ddof=1)
+            rows.append(row)
+    return pd.DataFrame(rows)
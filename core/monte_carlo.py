@@ -0,0 +1,76 @@
+import numpy as np
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+
+from core.microprice_simulator import _growth_factors
+from core.risk import inventory_pnl
+from core.instrumentation import timed
+
+
+@dataclass
+class MCRiskResult:
+    var: float
+    es: float
+    mean_pnl: float
+    alpha: float
+    n_paths: int
+    inventory: float
+
+
+def _terminal_chunk(args) -> np.ndarray:
+    """Worker: terminal gross return of one chunk of paths (only n_rows x n_steps in memory)."""
+    seed_seq, n_rows, n_steps, model_kwargs = args
+    rng = np.random.default_rng(seed_seq)
+    growth = _growth_factors(rng, (n_rows, n_steps), **model_kwargs)
+    return growth.prod(axis=1, dtype=np.float64)
+
+
+@timed("var.monte_carlo")
+def mc_var(trade_prices, trade_qtys, current_price: float,
+           n_paths: int = 100_000, n_steps: int = 60, alpha: float = 0.99,
+           sigma_bp: float = 30, model: str = "normal", mu: float = 0.0, dof: float = 4.0,
+           returns=None, seed: int = 42, chunk_size: int = 50_000, n_workers: int = 1,
+           method: str = "plain", dtype=np.float64) -> MCRiskResult:
+    """
+    Monte Carlo VaR and Expected Shortfall for the inventory held by inventory_pnl.
+
+    Paths follow simulate_paths (model = "normal", "gbm", "t" or "bootstrap");
+    the loss is the change in unrealized PnL from current_price to the end of
+    the n_steps horizon, reported as a positive number.
+
+    chunk_size : paths generated per block, bounds memory at chunk_size * n_steps floats
+    n_workers  : >1 fans chunks out to a process pool
+    method     : "plain", "antithetic" or "sobol" sampling (see simulate_paths)
+    dtype      : np.float32 halves the memory of each chunk
+    seed       : root of a SeedSequence; each chunk gets its own spawned stream, so the
+                 result depends only on (seed, chunk_size), not on n_workers
+    """
+    if n_paths < 1 or chunk_size < 1:
+        raise ValueError("n_paths and chunk_size must be at least 1")
+    qty = inventory_pnl(np.asarray(trade_prices, dtype=float),
+                        np.asarray(trade_qtys, dtype=float), current_price).inventory
+    model_kwargs = {"model": model, "sigma_bp": sigma_bp, "mu": mu, "dof": dof, "returns": returns,
+                    "method": method, "dtype": dtype}
+
+    n_chunks = -(-n_paths // chunk_size)
+    sizes = [chunk_size] * (n_chunks - 1) + [n_paths - chunk_size * (n_chunks - 1)]
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    tasks = [(s, n, n_steps, model_kwargs) for s, n in zip(seeds, sizes)]
+
+    if n_workers > 1 and n_chunks > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            chunks = list(pool.map(_terminal_chunk, tasks))
+    else:
+        chunks = [_terminal_chunk(t) for t in tasks]
+
+    pnl = (np.concatenate(chunks) - 1.0) * current_price * qty  # (n_paths,)
+    idx = int((1 - alpha) * n_paths)
+    tail = np.partition(pnl, idx)[:idx + 1]
+    return MCRiskResult(
+        var=float(abs(tail.max())),
+        es=float(abs(tail.mean())),
+        mean_pnl=float(pnl.mean()),
+        alpha=alpha,
+        n_paths=n_paths,
+        inventory=float(qty),
+    )
@@ -1,8 +1,13 @@
+from __future__ import annotations
+
 import math
 import numpy as np
-import pandas as pd
 from dataclasses import dataclass
 
+from core._lazy import lazy_import
+
+pd = lazy_import("pandas")
+
 
 @dataclass
 class NDFQuote:
@@ -48,15 +53,177 @@ def make_ndf_quote(spot: float, r_annual: float, q_annual: float,
     tenor_days : tenor in days
     spread_bp  : dealer spread in basis points
     """
-    df = crypto_forward_curve(spot, r_annual, q_annual, [tenor_days], spread_bp)
-    row = df.iloc[0]
-    return NDFQuote(forward=row['forward'], bid=row['bid'], ask=row['ask'])
+    # scalar fast path: same formula as crypto_forward_curve without building a DataFrame
+    forward = spot * math.exp((r_annual - q_annual) * (tenor_days / 365.0))
+    half_spread = forward * spread_bp / 10000 / 2
+    return NDFQuote(forward=forward, bid=forward - half_spread, ask=forward + half_spread)
+
+QUOTE_DTYPE = np.dtype([('forward', 'f8'), ('bid', 'f8'), ('ask', 'f8')])
+
+def interp_rates(curve_days, curve_rates, tenors_days) -> np.ndarray:
+    """
+    Linearly interpolate a term structure onto tenors (flat beyond the end knots).
+
+    curve_days  : (K,) increasing knot tenors in days
+    curve_rates : (K,) or (U, K) annualized rates, one row per underlying
+    tenors_days : (T,) tenors to price
+    Returns (T,) or (U, T), ready to pass to forward_board as a term-structured rate
+    (use rates[None, :] to share a (T,) curve across underlyings).
+    """
+    days = np.asarray(curve_days, dtype=float)
+    rates = np.asarray(curve_rates, dtype=float)
+    t = np.clip(np.asarray(tenors_days, dtype=float), days[0], days[-1])
+    if len(days) == 1:
+        # one knot: flat curve
+        return rates[..., np.zeros(t.shape, dtype=np.intp)]
+    hi = np.clip(np.searchsorted(days, t, side='right'), 1, len(days) - 1)
+    lo = hi - 1
+    w = (t - days[lo]) / (days[hi] - days[lo])
+    return rates[..., lo] * (1 - w) + rates[..., hi] * w
+
+def _per_underlying(x, n_underlyings: int, n_tenors: int, name: str = "rate") -> np.ndarray:
+    # scalar -> broadcast, (U,) -> one value per underlying, (U, T)/(1, T)/(U, 1) -> term structure.
+    # A 1-D input always means per underlying; pass a shared curve as (1, T).
+    x = np.asarray(x, dtype=float)
+    if x.ndim == 0:
+        return x
+    if x.ndim == 1:
+        if len(x) != n_underlyings:
+            raise ValueError(f"{name} has {len(x)} values but there are {n_underlyings} underlyings; "
+                             f"pass a term structure shared by all underlyings as shape (1, {n_tenors})")
+        return x[:, None]
+    if x.ndim == 2 and x.shape[0] in (1, n_underlyings) and x.shape[1] in (1, n_tenors):
+        return x
+    raise ValueError(f"{name} has shape {x.shape}; expected scalar, ({n_underlyings},), "
+                     f"({n_underlyings}, {n_tenors}) or (1, {n_tenors})")
+
+def forward_board(spots, r_annual, q_annual, tenors_days, spread_bp=20) -> np.ndarray:
+    """
+    Price forwards for many underlyings and tenors in one call.
+
+    spots       : (U,) spot or perp mids
+    r_annual    : scalar, (U,) per underlying, or (U, T) / (1, T) term-structured (see interp_rates);
+                  a 1-D array is always per underlying, so pass a shared (T,) curve as curve[None, :]
+    q_annual    : same shapes as r_annual (crypto funding)
+    tenors_days : (T,) maturities in days
+    spread_bp   : scalar or (U,) dealer spread in basis points
+
+    Returns a (U, T) structured array with fields forward, bid, ask, using the
+    same formula as crypto_forward_curve.
+    """
+    S = np.asarray(spots, dtype=float).reshape(-1, 1)
+    T = np.asarray(tenors_days, dtype=float) / 365.0
+    U, n_t = S.shape[0], T.shape[0]
+    r = _per_underlying(r_annual, U, n_t, "r_annual")
+    q = _per_underlying(q_annual, U, n_t, "q_annual")
+    forwards = S * np.exp((r - q) * T)
+    half_spread = forwards * _per_underlying(spread_bp, U, n_t, "spread_bp") / 10000 / 2
+
+    out = np.empty(forwards.shape, dtype=QUOTE_DTYPE)
+    out['forward'] = forwards
+    out['bid'] = forwards - half_spread
+    out['ask'] = forwards + half_spread
+    return out
+
+def funding_from_store(pairs, store=None) -> np.ndarray:
+    """
+    Annualized perp funding per pair from the shared carry store, for use as
+    funding_crypto / q_annual. Pairs with no fresh entry are NaN; refresh them
+    with ExchangeClient('perp').funding_rates(pairs).
+    """
+    if store is None:
+        from core.ttl_store import carry_store as store
+    recs = [store.get(('funding', p)) for p in pairs]
+    return np.array([r['funding_annual'] if r else np.nan for r in recs])
+
+class LiveForwardBoard:
+    """
+    Multi-tenor forward board that reprices on every mid update.
+
+    The carry factors exp((r - q) T) and the bid/ask multipliers are computed
+    once per rate/funding/spread change; each tick is then a single multiply
+    of the new mid against the precomputed (T,) factor rows.
+
+    tenors_days : (T,) maturities in days
+    r_annual, q_annual, spread_bp : as in forward_board, per underlying or term-structured
+    underlyings : labels, e.g. ['spot:BTC/USDT', 'perp:BTC/USDT']; None for a single one
+    """
+
+    def __init__(self, tenors_days, r_annual: float, q_annual: float, spread_bp: float = 20,
+                 underlyings=None):
+        self.tenors_days = np.asarray(tenors_days, dtype=float)
+        self.underlyings = list(underlyings) if underlyings is not None else [None]
+        self._index = {u: i for i, u in enumerate(self.underlyings)}
+        self.r_annual, self.q_annual, self.spread_bp = r_annual, q_annual, spread_bp
+        n = len(self.underlyings)
+        self.mids = np.full(n, np.nan)
+        self.quotes = np.full((n, len(self.tenors_days)), np.nan, dtype=QUOTE_DTYPE)
+        self._factors = np.empty((3, n, len(self.tenors_days)))  # forward, bid, ask multipliers
+        self._rebuild()
+
+    def _rebuild(self):
+        # forward_board on a unit spot gives exactly the per-tenor multipliers
+        unit = forward_board(np.ones(len(self.underlyings)), self.r_annual, self.q_annual,
+                             self.tenors_days, self.spread_bp)
+        for k, field in enumerate(QUOTE_DTYPE.names):
+            self._factors[k] = unit[field]
+        ok = ~np.isnan(self.mids)
+        if ok.any():
+            self._reprice(np.flatnonzero(ok))
+
+    def set_params(self, r_annual: float = None, q_annual: float = None, spread_bp: float = None):
+        """Change rates, funding or spread; the only call that recomputes exponentials."""
+        if r_annual is not None:
+            self.r_annual = r_annual
+        if q_annual is not None:
+            self.q_annual = q_annual
+        if spread_bp is not None:
+            self.spread_bp = spread_bp
+        self._rebuild()
+
+    def _reprice(self, idx):
+        mids = self.mids[idx, None]
+        for k, field in enumerate(QUOTE_DTYPE.names):
+            self.quotes[field][idx] = mids * self._factors[k, idx]
+
+    def update(self, mid: float, underlying=None) -> np.ndarray:
+        """New mid for one underlying; returns its repriced (T,) quote row."""
+        i = self._index[underlying]
+        self.mids[i] = mid
+        self._reprice(i)
+        return self.quotes[i]
+
+    def on_tick(self, row: dict):
+        """
+        Callback for poll_order_book / poll_order_books / poll_order_books_concurrent,
+        which all pass 'market' and 'symbol'. The underlying is '<market>:<symbol>',
+        or the bare symbol if the board was labelled by symbol only; ticks for
+        underlyings the board does not quote are ignored.
+        """
+        if self.underlyings == [None]:
+            self.update(row['mid'])
+            return
+        key = f"{row.get('market')}:{row.get('symbol')}"
+        if key not in self._index:
+            key = row.get('symbol')
+        if key in self._index:
+            self.update(row['mid'], key)
+
+    def reprice_series(self, mids, underlying=None) -> np.ndarray:
+        """Vectorized replay of a mid history: (n,) mids -> (n, T) structured quotes."""
+        i = self._index[underlying]
+        mids = np.asarray(mids, dtype=float)[:, None]
+        out = np.empty((mids.shape[0], len(self.tenors_days)), dtype=QUOTE_DTYPE)
+        for k, field in enumerate(QUOTE_DTYPE.names):
+            out[field] = mids * self._factors[k, i]
+        return out
 
-# Example usage
-spot = 500000
-funding_dom = 0.05
-funding_crypto = -0.02
-tenors = [1, 7, 30, 90, 180]
+# Example usage (python -m core.ndf_pricer)
+if __name__ == "__main__":
+    spot = 500000
+    funding_dom = 0.05
+    funding_crypto = -0.02
+    tenors = [1, 7, 30, 90, 180]
 
-curve = crypto_forward_curve(spot, funding_dom, funding_crypto, tenors)
-print(curve)
+    curve = crypto_forward_curve(spot, funding_dom, funding_crypto, tenors)
+    print(curve)
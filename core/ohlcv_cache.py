@@ -0,0 +1,113 @@
+import os
+import time
+import logging
+import numpy as np
+
+from core import instrumentation as instr
+
+log = logging.getLogger(__name__)
+
+TS, OPEN, HIGH, LOW, CLOSE, VOLUME = range(6)
+
+
+class OHLCVCache:
+    """
+    On-disk OHLCV cache keyed by (market type, symbol, timeframe); market types
+    of venues other than binance are prefixed with the exchange id ('okx-perp').
+
+    Candles are kept as one (n, 6) float64 .npy file per key, columns
+    [timestamp ms, open, high, low, close, volume] (the ccxt layout, so
+    arrays slot straight into the risk functions, e.g. arr[:, CLOSE]).
+    A warm call only fetches candles from the last cached timestamp on;
+    history longer than one request is backfilled page by page with `since`.
+    """
+
+    def __init__(self, root: str = os.path.join('data', 'cache', 'ohlcv'), page_limit: int = 1000):
+        self.root = root
+        self.page_limit = page_limit
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def market_key(client) -> str:
+        exchange_id = getattr(client, 'exchange_id', 'binance')
+        return client.market_type if exchange_id == 'binance' else f"{exchange_id}-{client.market_type}"
+
+    def _path(self, market_type: str, symbol: str, timeframe: str) -> str:
+        key = symbol.replace('/', '-').replace(':', '-')
+        return os.path.join(self.root, f"{market_type}_{key}_{timeframe}.npy")
+
+    def load(self, market_type: str, symbol: str, timeframe: str) -> np.ndarray:
+        """Cached candles, or an empty (0, 6) array."""
+        path = self._path(market_type, symbol, timeframe)
+        if not os.path.exists(path):
+            return np.empty((0, 6))
+        return np.load(path)
+
+    def _save(self, path: str, arr: np.ndarray):
+        tmp = path + '.tmp.npy'
+        np.save(tmp, arr)
+        os.replace(tmp, path)
+
+    def _fetch_range(self, client, symbol: str, timeframe: str, since: int, until: int = None) -> np.ndarray:
+        """Page forward from `since` until the exchange runs out of candles or `until` is reached."""
+        tf_ms = client.client.parse_timeframe(timeframe) * 1000
+        pages = []
+        while True:
+            batch = client.ohlcv(symbol, timeframe=timeframe, limit=self.page_limit, since=since)
+            if not batch:
+                break
+            arr = np.asarray(batch, dtype=float)
+            pages.append(arr)
+            last = int(arr[-1, TS])
+            if len(batch) < self.page_limit or (until is not None and last >= until):
+                break
+            since = last + tf_ms
+        if not pages:
+            return np.empty((0, 6))
+        out = np.concatenate(pages)
+        if until is not None:
+            out = out[out[:, TS] < until]
+        return out
+
+    @staticmethod
+    def _merge(*blocks) -> np.ndarray:
+        # later blocks win on duplicate timestamps (the last cached candle may have been partial)
+        blocks = [b for b in blocks if len(b)]
+        if not blocks:
+            return np.empty((0, 6))
+        arr = np.concatenate(blocks)
+        ts = arr[::-1, TS]
+        _, idx = np.unique(ts, return_index=True)
+        return arr[::-1][idx]
+
+    def ohlcv(self, client, symbol: str, timeframe: str = '1h', limit: int = 100) -> np.ndarray:
+        """
+        Return the latest `limit` candles for symbol as an (n, 6) array, fetching
+        only what is missing from the cache. `client` is an ExchangeClient.
+        """
+        market = self.market_key(client)
+        path = self._path(market, symbol, timeframe)
+        cached = self.load(market, symbol, timeframe)
+        tf_ms = client.client.parse_timeframe(timeframe) * 1000
+        now_ms = int(time.time() * 1000)
+        start = (now_ms // tf_ms - limit + 1) * tf_ms
+
+        blocks = [cached]
+        if len(cached) == 0 or cached[-1, TS] < start:
+            instr.count('ohlcv_cache.miss')
+            log.info(f"OHLCV cache cold for {market} {symbol} {timeframe}, fetching {limit} candles")
+            blocks = [self._fetch_range(client, symbol, timeframe, start)]
+        else:
+            instr.count('ohlcv_cache.hit')
+            if cached[0, TS] > start:
+                blocks.insert(0, self._fetch_range(client, symbol, timeframe, start, until=int(cached[0, TS])))
+            # refetch the last cached candle too, it was probably still open
+            blocks.append(self._fetch_range(client, symbol, timeframe, int(cached[-1, TS])))
+
+        merged = self._merge(*blocks)
+        if len(merged) != len(cached) or (len(merged) and not np.array_equal(merged[-1], cached[-1])):
+            self._save(path, merged)
+        return merged[-limit:]
+
+    def closes(self, client, symbol: str, timeframe: str = '1h', limit: int = 100) -> np.ndarray:
+        return self.ohlcv(client, symbol, timeframe, limit)[:, CLOSE]
@@ -0,0 +1,367 @@
+"""
+Pre-trade risk check service.
+
+Keeps the latest books, return windows and positions in memory and answers,
+for a candidate trade (symbol, signed qty):
+  - incremental historical VaR of the book (same estimator as historical_var)
+  - the worst stress_scenarios row for the post-trade position
+  - the expected cost of sweeping the visible book for the trade
+
+Everything a query needs is precomputed when the inputs change: the book's
+P&L vector per return scenario (kept sorted, so the current VaR is a lookup),
+per-symbol sorted returns (standalone VaR is a lookup), the unit stress cube
+per symbol (stress P&L is linear in quantity) and cumulative depth per book.
+
+    python -m core.pretrade_service BTC/USDT=5.7 ETH/USDT=-40 --http 8765
+    curl 'localhost:8765/check?symbol=BTC/USDT&qty=2'
+
+    python -m core.pretrade_service BTC/USDT=5.7 --unix /tmp/pretrade.sock
+    # one JSON request per line: {"op": "check", "symbol": "BTC/USDT", "qty": 2}
+"""
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from urllib.parse import urlsplit, parse_qsl
+
+import numpy as np
+
+from core import instrumentation as instr
+from core.execution import _prepare_side, _notional_to
+from core.risk import stress_grid
+from core.snapshot_store import BID, ASK, book_array
+
+log = logging.getLogger(__name__)
+
+STRESS_COLUMNS = ('Shock', 'Fees', 'Volatility', 'Shocked Price', 'Net PnL')
+
+
+class PreTradeRisk:
+    """
+    In-memory risk state for one book of positions.
+
+    returns are simple returns at the VaR horizon (e.g. overlapping 24h returns
+    from core.returns), one window per symbol; windows are aligned on their
+    trailing observations. alpha follows historical_var.
+    """
+
+    def __init__(self, alpha: float = 0.99, book_depth: int = 50, stress_kwargs: dict = None):
+        self.alpha = alpha
+        self.book_depth = book_depth
+        self.stress_kwargs = stress_kwargs or {}
+        self.symbols = []
+        self._ids = {}
+        self.qty = np.zeros(0)
+        self.price = np.zeros(0)
+        self._returns = {}
+        self._sorted_returns = {}
+        self._unit_stress = {}
+        self._books = {}
+        self._dirty = True
+
+    # --- state updates ---
+    def _id(self, symbol: str) -> int:
+        i = self._ids.get(symbol)
+        if i is None:
+            i = self._ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+            self.qty = np.append(self.qty, 0.0)
+            self.price = np.append(self.price, np.nan)
+        return i
+
+    def _require(self, symbol: str) -> int:
+        i = self._ids.get(symbol)
+        if i is None or symbol not in self._returns or np.isnan(self.price[i]):
+            raise KeyError(symbol)
+        return i
+
+    def set_position(self, symbol: str, qty: float):
+        self.qty[self._id(symbol)] = float(qty)
+        self._dirty = True
+
+    def set_price(self, symbol: str, price: float):
+        i = self._id(symbol)
+        self.price[i] = float(price)
+        self._unit_stress[symbol] = stress_grid(float(price), position_qty=1.0, layout='cube', **self.stress_kwargs)
+        self._dirty = True
+
+    def set_returns(self, symbol: str, returns):
+        r = np.asarray(returns, dtype=float).ravel()
+        r = r[np.isfinite(r)]
+        if not r.size:
+            raise ValueError(f"{symbol}: returns window has no finite values")
+        self._id(symbol)
+        self._returns[symbol] = r
+        self._sorted_returns[symbol] = np.sort(r)
+        self._dirty = True
+
+    def set_book(self, symbol: str, bids, asks, update_price: bool = True):
+        """Latest order book (ccxt lists); cumulative depth is prepared here, not per query."""
+        book = book_array(bids, asks, self.book_depth)[None]
+        mid = (book[0, BID, 0, 0] + book[0, ASK, 0, 0]) / 2.0
+        self._books[symbol] = {'mid': mid, 'buy': _prepare_side(book, ASK), 'sell': _prepare_side(book, BID)}
+        if update_price and np.isfinite(mid):
+            self.set_price(symbol, mid)
+
+    def _rebuild(self):
+        """Aligned (k, n) returns, the book's P&L per scenario and its sorted copy."""
+        with instr.span('pretrade.rebuild'):
+            loaded = [s for s in self.symbols if s in self._returns]
+            n = min((len(self._returns[s]) for s in loaded), default=0)
+            self._R = np.zeros((len(self.symbols), n))
+            for s in loaded:
+                self._R[self._ids[s]] = self._returns[s][-n:] if n else []
+            notional = np.nan_to_num(self.qty * self.price)
+            self._pnl = notional @ self._R
+            self._sorted_pnl = np.sort(self._pnl)
+            self._k = int((1 - self.alpha) * n)
+            self._dirty = False
+
+    # --- queries ---
+    def book_var(self) -> float:
+        if self._dirty:
+            self._rebuild()
+        return abs(float(self._sorted_pnl[self._k])) if len(self._sorted_pnl) else 0.0
+
+    def standalone_var(self, symbol: str, qty: float) -> float:
+        """historical_var of the trade on its own: one lookup in the sorted returns."""
+        r = self._sorted_returns[symbol]
+        k = int((1 - self.alpha) * len(r))
+        notional = qty * self.price[self._ids[symbol]]
+        # a long loses on the k-th smallest return, a short on the k-th largest
+        return abs(float(r[k] if notional >= 0 else r[len(r) - 1 - k]) * notional)
+
+    def worst_stress(self, symbol: str, qty: float) -> dict:
+        cube = self._unit_stress[symbol]
+        net = qty * cube.net_pnl[0]
+        s, f, v = np.unravel_index(np.argmin(net), net.shape)
+        values = (cube.shocks[s], cube.fee_multipliers[f], cube.vol_multipliers[v],
+                  cube.shocked_price[0, s], net[s, f, v])
+        return dict(zip(STRESS_COLUMNS, map(float, values)))
+
+    def execution_cost(self, symbol: str, qty: float) -> dict:
+        """Immediate sweep of the latest book: average price, cost vs mid in bps and in quote currency."""
+        book = self._books.get(symbol)
+        if book is None or qty == 0:
+            return {}
+        side = 'buy' if qty > 0 else 'sell'
+        px, cum, cum_notional = book[side]
+        x = abs(qty)
+        notional = float(_notional_to(px[0], cum[0], cum_notional[0], x))
+        avg = notional / x
+        sign = 1.0 if side == 'buy' else -1.0
+        cost_bps = sign * (avg - book['mid']) / book['mid'] * 10000
+        return {'side': side, 'avg_price': avg, 'cost_bps': cost_bps,
+                'cost': cost_bps / 10000 * x * book['mid'], 'exhausted': bool(x > cum[0, -1])}
+
+    def check(self, symbol: str, qty: float) -> dict:
+        """Full pre-trade answer for trading `qty` (signed) of `symbol`."""
+        t0 = time.perf_counter()
+        i = self._require(symbol)
+        qty = float(qty)
+        var_before = self.book_var()
+        if len(self._pnl):
+            pnl_after = self._pnl + (qty * self.price[i]) * self._R[i]
+            var_after = abs(float(np.partition(pnl_after, self._k)[self._k]))
+        else:
+            var_after = 0.0
+        pos_after = self.qty[i] + qty
+        stress_before = self.worst_stress(symbol, self.qty[i])
+        stress_after = self.worst_stress(symbol, pos_after)
+        out = {
+            'symbol': symbol,
+            'qty': qty,
+            'price': float(self.price[i]),
+            'position_after': float(pos_after),
+            'var_before': var_before,
+            'var_after': var_after,
+            'incremental_var': var_after - var_before,
+            'standalone_var': self.standalone_var(symbol, qty),
+            'worst_stress': stress_after,
+            'stress_change': stress_after['Net PnL'] - stress_before['Net PnL'],
+            'execution': self.execution_cost(symbol, qty),
+        }
+        elapsed = time.perf_counter() - t0
+        out['latency_us'] = elapsed * 1e6
+        if instr.is_enabled():
+            instr.registry.observe('pretrade.check', elapsed)
+        return out
+
+
+# --- protocol ---
+def handle(risk: PreTradeRisk, req: dict) -> dict:
+    """Dispatch one request dict: op = check | position | price | returns | book | var | metrics | health."""
+    op = req.get('op', 'check')
+    try:
+        if op == 'check':
+            return risk.check(req['symbol'], float(req['qty']))
+        if op == 'position':
+            risk.set_position(req['symbol'], float(req['qty']))
+        elif op == 'price':
+            risk.set_price(req['symbol'], float(req['price']))
+        elif op == 'returns':
+            risk.set_returns(req['symbol'], req['returns'])
+        elif op == 'book':
+            risk.set_book(req['symbol'], req['bids'], req['asks'])
+        elif op == 'var':
+            return {'var': risk.book_var(), 'symbols': risk.symbols, 'positions': risk.qty.tolist()}
+        elif op == 'metrics':
+            return instr.registry.snapshot()
+        elif op != 'health':
+            return {'error': f"unknown op {op!r}"}
+        return {'ok': True}
+    except KeyError as e:
+        return {'error': f"missing field or unloaded symbol: {e.args[0]}"}
+    except (TypeError, ValueError) as e:
+        return {'error': str(e)}
+    except Exception as e:
+        # a bad state must not drop the connection; report it like any other rejected request
+        log.exception(f"Request {op!r} failed")
+        return {'error': f"{op} failed: {e}"}
+
+
+async def _unix_client(risk, reader, writer):
+    try:
+        while line := await reader.readline():
+            try:
+                resp = handle(risk, json.loads(line))
+            except json.JSONDecodeError as e:
+                resp = {'error': f"bad json: {e}"}
+            writer.write(json.dumps(resp).encode() + b'\n')
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+async def _http_client(risk, reader, writer):
+    """Minimal HTTP/1.1 with keep-alive: GET /<op>?k=v or POST /<op> with a JSON body."""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+            headers = {}
+            while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                k, _, v = line.decode('latin-1').partition(':')
+                headers[k.strip().lower()] = v.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+            url = urlsplit(target)
+            req = dict(parse_qsl(url.query))
+            status = '200 OK'
+            try:
+                if body:
+                    req.update(json.loads(body))
+            except json.JSONDecodeError as e:
+                req, status = None, '400 Bad Request'
+                resp = {'error': f"bad json: {e}"}
+            if req is not None:
+                req['op'] = url.path.strip('/') or 'health'
+                resp = handle(risk, req)
+                if 'error' in resp:
+                    status = '400 Bad Request'
+            payload = json.dumps(resp).encode()
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload)
+            await writer.drain()
+            if headers.get('connection', '').lower() == 'close':
+                break
+    except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(risk: PreTradeRisk, port: int = None, host: str = '127.0.0.1', unix_path: str = None):
+    """Serve until cancelled, over HTTP on host:port or a Unix socket at unix_path."""
+    if unix_path:
+        server = await asyncio.start_unix_server(lambda r, w: _unix_client(risk, r, w), path=unix_path)
+        log.info(f"Pre-trade risk listening on unix:{unix_path}")
+    else:
+        server = await asyncio.start_server(lambda r, w: _http_client(risk, r, w), host, port)
+        log.info(f"Pre-trade risk listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+# --- live state ---
+def load_state(risk: PreTradeRisk, positions, clients: dict, cache=None, horizon: int = 24,
+               lookback: int = 24 * 250):
+    """
+    Fill the state from exchanges: hourly history -> horizon returns, one book per
+    instrument -> price (its mid, else the last close) and depth. Instruments
+    without usable history are logged and skipped.
+    """
+    from core.batch_report import fetch_instruments, net_positions
+    from core.ohlcv_cache import OHLCVCache
+    from core.returns import Returns
+    positions = net_positions(positions)
+    data = fetch_instruments(clients, positions, cache or OHLCVCache(), lookback_days=lookback // 24 + 1,
+                             book_limit=risk.book_depth)
+    for symbol, market, qty in positions:
+        if (symbol, market) not in data:
+            continue
+        closes, ob = data[(symbol, market)]
+        try:
+            risk.set_returns(symbol, np.expm1(Returns(closes).window(horizon, lookback)))
+        except ValueError as e:
+            log.error(f"Skipping {symbol} ({market}): {e}")
+            continue
+        risk.set_position(symbol, qty)
+        risk.set_book(symbol, ob['bids'], ob['asks'])
+        if np.isnan(risk.price[risk._ids[symbol]]):
+            risk.set_price(symbol, closes[-1])
+
+
+async def refresh_books(risk: PreTradeRisk, positions, clients: dict, interval_s: float = 2.0):
+    """Keep books (and prices) current in the background; fetches run in the default executor."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval_s)
+        for symbol, market, _ in positions:
+            try:
+                ob = await loop.run_in_executor(None, lambda: clients[market].order_book(symbol,
+                                                                                          limit=risk.book_depth))
+                risk.set_book(symbol, ob['bids'], ob['asks'])
+            except Exception as e:
+                log.warning(f"Book refresh failed for {symbol} ({market}): {e}")
+
+
+def main(argv=None):
+    from core.batch_report import parse_position
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('positions', nargs='+', type=parse_position, help='SYMBOL[@market]=QTY')
+    parser.add_argument('--http', type=int, default=8765, help='HTTP port')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--unix', help='serve JSON lines on this Unix socket instead of HTTP')
+    parser.add_argument('--alpha', type=float, default=0.99)
+    parser.add_argument('--refresh-s', type=float, default=2.0, help='book refresh interval')
+    parser.add_argument('--metrics', action='store_true', help='record stage timings (op=metrics)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    if args.metrics:
+        instr.enable()
+    from core.exchange_client import ExchangeClient
+    clients = {m: ExchangeClient(m) for m in dict.fromkeys(m for _, m, _ in args.positions)}
+    risk = PreTradeRisk(alpha=args.alpha)
+    load_state(risk, args.positions, clients)
+
+    async def run():
+        refresher = asyncio.create_task(refresh_books(risk, args.positions, clients, args.refresh_s))
+        try:
+            await serve(risk, args.http, args.host, args.unix)
+        finally:
+            refresher.cancel()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
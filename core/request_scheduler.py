@@ -0,0 +1,220 @@
+import time
+import random
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from core._lazy import lazy_import
+from core import instrumentation as instr
+
+ccxt = lazy_import("ccxt")
+
+log = logging.getLogger(__name__)
+
+# Request weight budget per rolling window, by market type (Binance meters spot and futures separately)
+DEFAULT_LIMITS = {
+    'binance': {'spot': 6000, 'perp': 2400},
+}
+FALLBACK_LIMIT = 1200
+WINDOW_S = 60.0
+
+
+def request_weight(method: str, limit: int = None) -> int:
+    """Approximate Binance weight of a ccxt call; unknown methods count as 1."""
+    if method == 'fetch_order_book':
+        if limit is None or limit <= 100:
+            return 5
+        return 10 if limit <= 500 else 50
+    if method in ('fetch_funding_rates',):
+        return 10
+    return {'fetch_ohlcv': 2, 'fetch_funding_rate': 1, 'fetch_funding_rate_history': 1}.get(method, 1)
+
+
+class RequestScheduler:
+    """
+    Request scheduler shared by every client of one exchange.
+
+    - tracks request weight per market type against the exchange's rolling-window limit
+      and queues callers until the budget allows the next request
+    - retries timeouts and 429/418 responses with exponential backoff plus jitter;
+      a rate-limit response pauses the whole exchange, not just the caller
+    - coalesces identical in-flight requests: a second caller asking for the same
+      (client, market, method, args) waits for the first result instead of sending again
+    - exposes queue depth, in-flight count, retries and latency via metrics()
+
+    clock/sleep are injectable so tests can drive it with a fake exchange.
+    """
+
+    _registry = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, exchange_id: str = 'binance', limits: dict = None, window_s: float = WINDOW_S,
+                 max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 30.0, jitter: float = 0.5,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.exchange_id = exchange_id
+        self.limits = limits if limits is not None else DEFAULT_LIMITS.get(exchange_id, {})
+        self.window_s = window_s
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self._clock = clock
+        self._sleep = sleep
+
+        self._lock = threading.Lock()
+        self._used = {}             # market -> deque[(time, weight)]
+        self._cooldown_until = 0.0
+        self._inflight = {}         # coalescing key -> Future
+        self._queue_depth = 0
+        self._latency_ms = deque(maxlen=2048)
+        self._counts = {'requests': 0, 'retries': 0, 'coalesced': 0, 'rate_limited': 0, 'errors': 0}
+
+    @classmethod
+    def for_exchange(cls, exchange_id: str, **kwargs) -> "RequestScheduler":
+        """Process-wide scheduler for exchange_id (created on first use)."""
+        with cls._registry_lock:
+            if exchange_id not in cls._registry:
+                cls._registry[exchange_id] = cls(exchange_id, **kwargs)
+            return cls._registry[exchange_id]
+
+    # --- weight budget ---
+    def _limit(self, market: str) -> int:
+        return self.limits.get(market, FALLBACK_LIMIT)
+
+    def _acquire(self, market: str, weight: int):
+        if weight > self._limit(market):
+            raise ValueError(f"request weight {weight} exceeds the {self.exchange_id} {market} "
+                             f"budget of {self._limit(market)} per {self.window_s:.0f}s window")
+        waiting = False
+        try:
+            while True:
+                with self._lock:
+                    now = self._clock()
+                    used = self._used.setdefault(market, deque())
+                    while used and used[0][0] <= now - self.window_s:
+                        used.popleft()
+                    total = sum(w for _, w in used)
+                    if now >= self._cooldown_until and total + weight <= self._limit(market):
+                        used.append((now, weight))
+                        return
+                    wait = self._cooldown_until - now
+                    if total + weight > self._limit(market) and used:
+                        wait = max(wait, used[0][0] + self.window_s - now)
+                    if not waiting:
+                        self._queue_depth += 1
+                        waiting = True
+                self._sleep(max(wait, 0.001))
+        finally:
+            if waiting:
+                with self._lock:
+                    self._queue_depth -= 1
+
+    def _backoff(self, attempt: int, base_delay: float) -> float:
+        delay = min(base_delay * 2 ** attempt, self.max_delay)
+        return delay * (1 + self.jitter * random.random())
+
+    # --- execution ---
+    def _execute(self, func, args, kwargs, market: str, weight: int, retries: int, base_delay: float):
+        name = getattr(func, '__name__', 'request')
+        for attempt in range(retries):
+            self._acquire(market, weight)
+            t0 = self._clock()
+            try:
+                result = func(*args, **kwargs)
+                with self._lock:
+                    self._counts['requests'] += 1
+                    self._latency_ms.append((self._clock() - t0) * 1000.0)
+                return result
+            except (ccxt.DDoSProtection, ccxt.RateLimitExceeded) as e:
+                delay = self._backoff(attempt, base_delay)
+                with self._lock:
+                    self._counts['rate_limited'] += 1
+                    self._counts['retries'] += 1
+                    self._cooldown_until = max(self._cooldown_until, self._clock() + delay)
+                instr.count('fetch.rate_limited')
+                log.warning(f"Rate limited on {name} (attempt {attempt+1}/{retries}), "
+                            f"pausing {self.exchange_id} for {delay:.2f}s: {e}")
+            except ccxt.RequestTimeout:
+                delay = self._backoff(attempt, base_delay)
+                with self._lock:
+                    self._counts['retries'] += 1
+                instr.count('fetch.timeouts')
+                log.warning(f"Timeout on {name} (attempt {attempt+1}/{retries}), retrying in {delay:.2f}s")
+                self._sleep(delay)
+            except Exception as e:
+                with self._lock:
+                    self._counts['errors'] += 1
+                log.error(f"Unexpected error in {name}: {e}")
+                raise
+        with self._lock:
+            self._counts['errors'] += 1
+        raise RuntimeError(f"Failed {name} after {retries} retries")
+
+    def call(self, func, args=(), kwargs=None, market: str = 'spot', weight: int = None, coalesce: bool = True,
+             retries: int = None, base_delay: float = None):
+        """
+        Run func(*args, **kwargs) under the budget/retry policy.
+        weight defaults to request_weight(func.__name__, limit); retries/base_delay
+        override the scheduler defaults for this call.
+        """
+        kwargs = kwargs or {}
+        name = getattr(func, '__name__', 'request')
+        if weight is None:
+            limit = kwargs.get('limit')
+            if limit is None and name == 'fetch_order_book' and len(args) > 1:
+                limit = args[1]
+            weight = request_weight(name, limit)
+        policy = (self.max_retries if retries is None else retries,
+                  self.base_delay if base_delay is None else base_delay)
+        if not coalesce:
+            return self._execute(func, args, kwargs, market, weight, *policy)
+
+        # the bound client is part of the key, so the same call on two venues is never merged;
+        # repr keeps the key hashable when args contain lists (e.g. fetch_funding_rates)
+        target = id(getattr(func, '__self__', func))
+        key = (target, market, name, repr(args), repr(sorted(kwargs.items())))
+        with self._lock:
+            fut = self._inflight.get(key)
+            owner = fut is None
+            if owner:
+                fut = Future()
+                self._inflight[key] = fut
+            else:
+                self._counts['coalesced'] += 1
+        if not owner:
+            instr.count('fetch.coalesced')
+            return fut.result()
+        try:
+            result = self._execute(func, args, kwargs, market, weight, *policy)
+            fut.set_result(result)
+            return result
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def metrics(self) -> dict:
+        """Snapshot of queue depth, in-flight requests, counters, weight used and latency."""
+        with self._lock:
+            now = self._clock()
+            lat = np.array(self._latency_ms)
+            weight_used = {m: sum(w for t, w in used if t > now - self.window_s) for m, used in self._used.items()}
+            out = dict(self._counts)
+            out.update({
+                'queue_depth': self._queue_depth,
+                'in_flight': len(self._inflight),
+                'weight_used': weight_used,
+                'weight_limit': {m: self._limit(m) for m in weight_used},
+                'cooldown_s': max(0.0, self._cooldown_until - now),
+            })
+        if lat.size:
+            out['latency_ms'] = {'mean': float(lat.mean()), 'p50': float(np.percentile(lat, 50)),
+                                 'p99': float(np.percentile(lat, 99)), 'max': float(lat.max())}
+        else:
+            out['latency_ms'] = {}
+        return out
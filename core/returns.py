@@ -0,0 +1,96 @@
+"""
+Multi-horizon returns computed once per dataset.
+
+Log prices are the cumulative sum of log returns, so every horizon is a
+difference of one array: r_h[t] = log p[t] - log p[t - h]. Each horizon is
+built once and cached; lookback windows are trailing slices (views) of it,
+handed to historical_var / portfolio_var without pandas.
+
+    rets = Returns.from_ohlcv(candles)                       # hourly candles
+    rets.var(horizon=24, lookback=24 * 250, notional=5e5)    # 250d VaR on 24h returns
+    rets.var_table(DEFAULT_HORIZONS, notional=5e5)
+"""
+import numpy as np
+
+from core.ohlcv_cache import CLOSE
+from core.risk import historical_var, portfolio_var
+
+BARS_PER_DAY = 24   # hourly candles
+
+# label -> (horizon in bars, lookback in observations), as in the risk reports
+DEFAULT_HORIZONS = {
+    'VaR Long (250d)': (BARS_PER_DAY, BARS_PER_DAY * 250),
+    'VaR Short (60d)': (BARS_PER_DAY, BARS_PER_DAY * 60),
+    'VaR Intraday (1h)': (1, BARS_PER_DAY * 30),
+}
+
+
+class Returns:
+    """
+    Log returns of one price series, shape (n,), or of an aligned panel with
+    time on the last axis, shape (k, n) (the portfolio_var layout).
+
+    horizon(h)            : h-bar log returns, overlapping (every bar) or not (every h-th bar,
+                            anchored on the latest bar); computed once and cached
+    window(h, lookback)   : the trailing `lookback` observations of horizon(h), as a view
+    var(...)              : historical VaR of a window; kind='simple' converts log returns
+                            to simple returns (exact P&L on a notional) for that window only
+    """
+
+    def __init__(self, closes):
+        closes = np.asarray(closes, dtype=float)
+        self.log_price = np.log(closes)
+        self._cache = {}
+
+    @classmethod
+    def from_ohlcv(cls, ohlcv) -> "Returns":
+        """From an (n, 6) OHLCV array (OHLCVCache layout)."""
+        return cls(np.asarray(ohlcv, dtype=float)[:, CLOSE])
+
+    def __len__(self) -> int:
+        return self.log_price.shape[-1]
+
+    def horizon(self, h: int = 1, overlapping: bool = True) -> np.ndarray:
+        key = (int(h), bool(overlapping) or h == 1)
+        out = self._cache.get(key)
+        if out is None:
+            lp = self.log_price
+            if h < 1 or h >= lp.shape[-1]:
+                raise ValueError(f"horizon must be in [1, {lp.shape[-1] - 1}] bars")
+            if key[1]:
+                out = lp[..., h:] - lp[..., :-h]
+            else:
+                end = lp[..., (lp.shape[-1] - 1) % h::h]
+                out = end[..., 1:] - end[..., :-1]
+            out.flags.writeable = False    # windows are shared views
+            self._cache[key] = out
+        return out
+
+    def window(self, h: int = 1, lookback: int = None, overlapping: bool = True) -> np.ndarray:
+        r = self.horizon(h, overlapping)
+        if lookback is None:
+            return r
+        if int(lookback) < 1:
+            raise ValueError(f"lookback must be at least 1 observation, got {lookback}")
+        n = r.shape[-1]
+        return r[..., max(n - int(lookback), 0):]
+
+    def var(self, alpha: float = 0.99, notional: float = 100000.0, horizon: int = 1, lookback: int = None,
+            overlapping: bool = True, kind: str = 'simple', sign: float = 1.0) -> float:
+        """Historical VaR of one series; sign=-1 for a short position (loss on the upper tail)."""
+        r = self.window(horizon, lookback, overlapping)
+        if kind == 'simple':
+            r = np.expm1(r)
+        return historical_var(r if sign == 1.0 else sign * r, alpha, notional)
+
+    def var_table(self, horizons: dict = None, alpha: float = 0.99, notional: float = 100000.0,
+                  overlapping: bool = True, kind: str = 'simple', sign: float = 1.0) -> dict:
+        """label -> VaR for each (horizon bars, lookback) in `horizons` (default DEFAULT_HORIZONS)."""
+        horizons = DEFAULT_HORIZONS if horizons is None else horizons
+        return {label: self.var(alpha, notional, h, lookback, overlapping, kind, sign)
+                for label, (h, lookback) in horizons.items()}
+
+    def portfolio_var(self, positions, h: int = 1, alphas=(0.99,), lookbacks: dict = None,
+                      overlapping: bool = True, instruments=None):
+        """portfolio_var on the (k, n) panel's h-bar log returns; lookbacks is label -> observations."""
+        return portfolio_var(self.horizon(h, overlapping), positions, alphas, lookbacks, instruments)
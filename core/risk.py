@@ -1,7 +1,16 @@
+from __future__ import annotations
+
+import math
+from bisect import bisect_left, insort
+from collections import deque
 import numpy as np
-import pandas as pd
 from dataclasses import dataclass
 
+from core._lazy import lazy_import
+from core.instrumentation import timed
+
+pd = lazy_import("pandas")
+
 @dataclass
 class PnLReport:
     realized: float
@@ -10,20 +19,360 @@ class PnLReport:
     inventory: float
 
 def inventory_pnl(trade_prices, trade_qtys, current_price) -> PnLReport:
-    # simple average cost inventory
-    qty = np.sum(trade_qtys)
-    cost = np.sum(trade_prices * trade_qtys) / max(qty, 1e-9)
-    unreal = (current_price - cost) * qty
-    realized = 0.0  # extend if you close trades
-    return PnLReport(realized=realized, unrealized=float(unreal), total=float(unreal), inventory=float(qty))
+    # average cost inventory; sells and flips realize PnL (see core.ledger.Ledger for books and FIFO)
+    trade_prices = np.asarray(trade_prices, dtype=float)
+    trade_qtys = np.asarray(trade_qtys, dtype=float)
+    if np.all(trade_qtys >= 0) or np.all(trade_qtys <= 0):
+        # one-sided fills never close anything: vectorized
+        qty = np.sum(trade_qtys)
+        unreal = current_price * qty - np.sum(trade_prices * trade_qtys)
+        return PnLReport(realized=0.0, unrealized=float(unreal), total=float(unreal), inventory=float(qty))
+    from core.ledger import Ledger  # core.ledger imports PnLReport from here
+    ledger = Ledger("average", capacity=1)
+    ledger.add_fills("", trade_prices, trade_qtys)
+    return ledger.report("", current_price)
 
+@timed("var.historical")
 def historical_var(returns: pd.Series, alpha: float = 0.99, notional: float = 100000.0) -> float:
     # historical simulation VaR: positive number as loss
-    r_sorted = returns.dropna().sort_values()
-    idx = int((1 - alpha) * len(r_sorted))
-    var_pct = r_sorted.iloc[idx]  # negative
+    r = np.asarray(returns, dtype=float)
+    r = r[~np.isnan(r)]
+    idx = int((1 - alpha) * len(r))
+    var_pct = np.partition(r, idx)[idx]  # negative; O(n) selection instead of a full sort
     return abs(var_pct) * notional
 
+class _SortedWindow:
+    """
+    Sorted multiset split into blocks of at most 2 * LOAD values, with a Fenwick
+    tree over block lengths. add/remove are a binary search over block maxima,
+    an insert/delete within one short block and a tree update, O(log n + LOAD);
+    kth is a tree descent plus one index. Splitting or dropping a block rebuilds
+    the tree in O(n / LOAD), once per ~LOAD updates.
+    """
+    LOAD = 512
+
+    def __init__(self):
+        self._blocks = []
+        self._maxes = []
+        self._tree = [0]
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def _build(self):
+        n = len(self._blocks)
+        tree = [0] * (n + 1)
+        for i, b in enumerate(self._blocks):
+            tree[i + 1] = len(b)
+        for i in range(1, n + 1):
+            j = i + (i & -i)
+            if j <= n:
+                tree[j] += tree[i]
+        self._tree = tree
+
+    def _update(self, i: int, delta: int):
+        tree, n = self._tree, len(self._blocks)
+        i += 1
+        while i <= n:
+            tree[i] += delta
+            i += i & -i
+
+    def add(self, x: float):
+        self._len += 1
+        if not self._blocks:
+            self._blocks.append([x])
+            self._maxes.append(x)
+            self._build()
+            return
+        i = bisect_left(self._maxes, x)
+        if i == len(self._blocks):
+            i -= 1
+            self._blocks[i].append(x)
+            self._maxes[i] = x
+        else:
+            insort(self._blocks[i], x)
+        block = self._blocks[i]
+        if len(block) > 2 * self.LOAD:
+            half = block[self.LOAD:]
+            del block[self.LOAD:]
+            self._maxes[i] = block[-1]
+            self._blocks.insert(i + 1, half)
+            self._maxes.insert(i + 1, half[-1])
+            self._build()
+        else:
+            self._update(i, 1)
+
+    def remove(self, x: float):
+        """Remove one occurrence of x, which must be present."""
+        i = bisect_left(self._maxes, x)
+        block = self._blocks[i]
+        del block[bisect_left(block, x)]
+        self._len -= 1
+        if block:
+            self._maxes[i] = block[-1]
+            self._update(i, -1)
+        else:
+            del self._blocks[i]
+            del self._maxes[i]
+            self._build()
+
+    def kth(self, k: int) -> float:
+        """k-th smallest value (0-based)."""
+        tree, n = self._tree, len(self._blocks)
+        pos, step = 0, 1 << n.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= n and tree[nxt] <= k:
+                pos = nxt
+                k -= tree[nxt]
+            step >>= 1
+        return self._blocks[pos][k]
+
+    def head(self, k: int) -> list:
+        """The k smallest values in order."""
+        out = []
+        for b in self._blocks:
+            if len(out) + len(b) >= k:
+                out.extend(b[:k - len(out)])
+                break
+            out.extend(b)
+        return out
+
+class RollingVaR:
+    """
+    Incremental historical VaR/ES over a fixed-size window of streaming returns.
+
+    Returns are kept in arrival order (ring buffer) and in a blocked sorted list,
+    so each push/evict is O(log n) plus a bounded block insert instead of a full
+    re-sort or an O(n) list shift. var is a tree lookup; es sums the tail, O(tail).
+    var/es match historical_var on the same window at any time.
+
+    window   : number of returns kept (e.g. 24*250 hourly candles)
+    alpha    : confidence level
+    notional : position size the VaR is scaled to
+    """
+    def __init__(self, window: int, alpha: float = 0.99, notional: float = 100000.0):
+        if window <= 0:
+            raise ValueError("window must be positive")
+        self.window = int(window)
+        self.alpha = alpha
+        self.notional = notional
+        self._ring = deque()
+        self._sorted = _SortedWindow()
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def push(self, r: float):
+        """Add one return, evicting the oldest once the window is full. NaNs are ignored."""
+        r = float(r)
+        if math.isnan(r):
+            return
+        if len(self._ring) == self.window:
+            old = self._ring.popleft()
+            self._sorted.remove(old)
+        self._ring.append(r)
+        self._sorted.add(r)
+
+    def extend(self, returns):
+        for r in np.asarray(returns, dtype=float).ravel():
+            self.push(r)
+
+    def _idx(self) -> int:
+        if not len(self._sorted):
+            raise ValueError("RollingVaR window is empty")
+        return int((1 - self.alpha) * len(self._sorted))
+
+    @property
+    def var(self) -> float:
+        # positive number as loss, same convention as historical_var
+        return abs(self._sorted.kth(self._idx())) * self.notional
+
+    @property
+    def es(self) -> float:
+        # expected shortfall: mean of the tail up to and including the VaR return
+        idx = self._idx()
+        return abs(math.fsum(self._sorted.head(idx + 1)) / (idx + 1)) * self.notional
+
+@dataclass
+class PortfolioVaR:
+    horizons: list               # horizon labels
+    alphas: np.ndarray           # (n_alphas,)
+    instruments: list            # instrument labels
+    var: np.ndarray              # (n_horizons, n_alphas)
+    component: np.ndarray        # (n_horizons, n_alphas, n_instruments), sums to var
+    marginal: np.ndarray         # (n_horizons, n_alphas, n_instruments), dVaR/dposition
+
+    def to_frame(self) -> pd.DataFrame:
+        """Long table: one row per (horizon, alpha) with total VaR and per-instrument components."""
+        n_h, n_a = self.var.shape
+        df = pd.DataFrame({
+            "Horizon": np.repeat(np.asarray(self.horizons, dtype=object), n_a),
+            "Alpha": np.tile(self.alphas, n_h),
+            "VaR": self.var.ravel(),
+        })
+        comp = pd.DataFrame(self.component.reshape(n_h * n_a, -1),
+                            columns=[f"Component {name}" for name in self.instruments])
+        return pd.concat([df, comp], axis=1)
+
+@timed("var.portfolio")
+def portfolio_var(returns, positions, alphas=(0.99,), horizons=None, instruments=None) -> PortfolioVaR:
+    """
+    Historical-simulation VaR for a whole book from one aligned returns matrix.
+
+    returns     : (n_instruments, n_obs) array or DataFrame of aligned returns;
+                  observations with a NaN in any instrument are dropped
+    positions   : (n_instruments,) notional per instrument (negative for shorts)
+    alphas      : confidence levels, all selected in one np.partition call per horizon
+    horizons    : mapping label -> trailing number of observations
+                  (e.g. {"250d": 250, "60d": 60}); None uses the full sample
+    instruments : labels for the component columns (defaults to DataFrame index or 0..n-1)
+
+    P&L per scenario is positions @ returns. Component VaR for instrument i is
+    the loss it contributes in the VaR scenario, so components sum to the VaR;
+    marginal VaR is component / position.
+    """
+    if instruments is None:
+        instruments = list(returns.index) if hasattr(returns, 'columns') else None
+    R = np.atleast_2d(np.asarray(returns, dtype=float))
+    w = np.atleast_1d(np.asarray(positions, dtype=float))
+    if R.shape[0] != w.shape[0]:
+        raise ValueError("returns must have one row per position")
+    R = R[:, ~np.isnan(R).any(axis=0)]
+    if instruments is None:
+        instruments = list(range(R.shape[0]))
+
+    alphas = np.atleast_1d(np.asarray(alphas, dtype=float))
+    if horizons is None:
+        horizons = {"full": R.shape[1]}
+
+    pnl = w @ R  # (n_obs,)
+    n_h, n_a, n_i = len(horizons), len(alphas), R.shape[0]
+    var = np.empty((n_h, n_a))
+    component = np.empty((n_h, n_a, n_i))
+    for h, (label, lookback) in enumerate(horizons.items()):
+        lookback = min(int(lookback), pnl.shape[0])
+        if lookback < 1:
+            raise ValueError(f"horizon {label!r} needs a lookback of at least 1 complete observation")
+        window = pnl[pnl.shape[0] - lookback:]  # view, no copy
+        kth = ((1 - alphas) * lookback).astype(int)
+        order = np.argpartition(window, np.unique(kth))
+        scen = order[kth] + (pnl.shape[0] - lookback)  # scenario index in the full sample
+        var[h] = np.abs(pnl[scen])  # positive number as loss, like historical_var
+        loss_sign = np.where(pnl[scen] <= 0, -1.0, 1.0)
+        component[h] = (w * R[:, scen].T) * loss_sign[:, None]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        marginal = np.where(w != 0, component / w, 0.0)
+    return PortfolioVaR(
+        horizons=list(horizons.keys()),
+        alphas=alphas,
+        instruments=list(instruments),
+        var=var,
+        component=component,
+        marginal=marginal,
+    )
+
+def perp_basis(pairs, store=None) -> np.ndarray:
+    """
+    Perp basis (mark - index) / index per pair from the shared carry store
+    (filled by ExchangeClient('perp').funding_rate(s)); NaN when missing or stale.
+    """
+    if store is None:
+        from core.ttl_store import carry_store as store
+    out = np.full(len(pairs), np.nan)
+    for i, p in enumerate(pairs):
+        rec = store.get(('funding', p))
+        if rec and rec['mark'] and rec['index']:
+            out[i] = (rec['mark'] - rec['index']) / rec['index']
+    return out
+
+@dataclass
+class StressCube:
+    shocks: np.ndarray           # (n_shocks,)
+    fee_multipliers: np.ndarray  # (n_fees,)
+    vol_multipliers: np.ndarray  # (n_vols,)
+    current_price: np.ndarray    # (n_positions,)
+    position_qty: np.ndarray     # (n_positions,)
+    shocked_price: np.ndarray    # (n_positions, n_shocks)
+    net_pnl: np.ndarray          # (n_positions, n_shocks, n_fees, n_vols)
+
+    def to_frame(self, with_position: bool = True) -> pd.DataFrame:
+        """
+        Flatten the cube into the long layout used by stress_scenarios.
+        Rows are ordered position, shock, fee multiplier, vol multiplier.
+        """
+        shape = self.net_pnl.shape
+        cols = {}
+        if with_position:
+            cols["Position"] = np.broadcast_to(np.arange(shape[0])[:, None, None, None], shape).ravel()
+        cols["Shock"] = np.broadcast_to(self.shocks[None, :, None, None], shape).ravel()
+        cols["Fees"] = np.broadcast_to(self.fee_multipliers[None, None, :, None], shape).ravel()
+        cols["Volatility"] = np.broadcast_to(self.vol_multipliers[None, None, None, :], shape).ravel()
+        cols["Shocked Price"] = np.broadcast_to(self.shocked_price[:, :, None, None], shape).ravel()
+        cols["Net PnL"] = self.net_pnl.ravel()
+        return pd.DataFrame(cols)
+
+    def worst(self) -> np.ndarray:
+        """Worst-case Net PnL per position across the whole grid."""
+        return self.net_pnl.reshape(self.net_pnl.shape[0], -1).min(axis=1)
+
+@timed("stress.grid")
+def stress_grid(
+    current_price,
+    shocks_pct = (-0.2, -0.1, +0.1, +0.2),
+    position_qty = 1.0,
+    base_fee_bp: float = 10.0,
+    fee_multipliers = (1.0, 1.5, 2.0),
+    vol_multipliers = (1.0, 1.5, 2.0),
+    slippage_bp: float = 5.0,
+    layout: str = "long"
+):
+    """
+    Broadcast the shock x fee x vol grid over a whole book in one call.
+
+    current_price : scalar or array of prices, one per position
+    position_qty  : scalar or array of quantities (broadcast against current_price)
+    layout        : "long" for a DataFrame with the stress_scenarios columns
+                    (plus a Position column when arrays are passed),
+                    "cube" for a StressCube holding the (positions, shocks, fees, vols) array
+
+    Net PnL uses the same formula as stress_scenarios.
+    """
+    if layout not in ("long", "cube"):
+        raise ValueError("layout must be 'long' or 'cube'")
+
+    is_book = np.ndim(current_price) > 0 or np.ndim(position_qty) > 0
+    price, qty = np.broadcast_arrays(np.atleast_1d(np.asarray(current_price, dtype=float)),
+                                     np.atleast_1d(np.asarray(position_qty, dtype=float)))
+    shocks = np.asarray(shocks_pct, dtype=float).ravel()
+    fm = np.asarray(fee_multipliers, dtype=float).ravel()
+    vm = np.asarray(vol_multipliers, dtype=float).ravel()
+
+    price = price[:, None]
+    qty = qty[:, None]
+    shocked_price = price * (1 + shocks)                            # (P, S)
+    pnl = (shocked_price - price) * qty                             # (P, S)
+    fee_base = (base_fee_bp / 10000.0) * shocked_price * qty        # (P, S)
+    slip_base = (slippage_bp / 10000.0) * shocked_price * qty       # (P, S)
+    fees = fee_base[:, :, None] * fm                                # (P, S, F)
+    slippage_cost = slip_base[:, :, None] * vm                      # (P, S, V)
+    net_pnl = pnl[:, :, None, None] - fees[:, :, :, None] - slippage_cost[:, :, None, :]
+
+    cube = StressCube(
+        shocks=shocks,
+        fee_multipliers=fm,
+        vol_multipliers=vm,
+        current_price=price[:, 0],
+        position_qty=qty[:, 0],
+        shocked_price=shocked_price,
+        net_pnl=net_pnl,
+    )
+    if layout == "cube":
+        return cube
+    return cube.to_frame(with_position=is_book)
+
 def stress_scenarios(
     current_price: float,
     shocks_pct = (-0.2, -0.1, +0.1, +0.2),
@@ -50,26 +399,18 @@ def stress_scenarios(
             Volatility (vol multiplier),
             Shocked Price (new price after shock),
             Net PnL (profit/loss after fees and slippage).
-    """    
-    rows = []
-    for s in shocks_pct:
-        shocked_price = current_price * (1 + s)
-        pnl = (shocked_price - current_price) * position_qty
-
-        for fm in fee_multipliers:
-            fees = (base_fee_bp / 10000.0) * shocked_price * position_qty * fm
-            for vm in vol_multipliers:
-                # Slippage grows with volatility multiplier
-                slippage_cost = (slippage_bp / 10000.0) * shocked_price * position_qty * vm
-                net_pnl = pnl - fees - slippage_cost
-                rows.append({
-                    "Shock": s,
-                    "Fees": fm,
-                    "Volatility": vm,
-                    "Shocked Price": shocked_price,
-                    "Net PnL": net_pnl
-                })
-    return pd.DataFrame(rows)
+
+    For many positions at once use stress_grid.
+    """
+    return stress_grid(
+        float(current_price),
+        shocks_pct=shocks_pct,
+        position_qty=float(position_qty),
+        base_fee_bp=base_fee_bp,
+        fee_multipliers=fee_multipliers,
+        vol_multipliers=vol_multipliers,
+        slippage_bp=slippage_bp,
+    )
 
 # def stress_scenarios(
 #     current_price: float,
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import os
+import json
+import logging
+import numpy as np
+from datetime import datetime, timezone
+
+from core._lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+log = logging.getLogger(__name__)
+
+BID, ASK = 0, 1
+PRICE, SIZE = 0, 1
+
+
+def book_array(bids, asks, depth: int = 20) -> np.ndarray:
+    """
+    Convert ccxt-style bid/ask lists into a fixed-width (2, depth, 2) array:
+    [side (bid, ask), level, field (price, size)]. Missing levels are NaN.
+    """
+    out = np.full((2, depth, 2), np.nan)
+    for side, levels in ((BID, bids), (ASK, asks)):
+        levels = levels[:depth]
+        if levels:
+            out[side, :len(levels)] = np.asarray(levels, dtype=float)[:, :2]
+    return out
+
+
+def book_frame(book: np.ndarray) -> pd.DataFrame:
+    """One stored book back in the depth_snapshot layout (price, size, side)."""
+    frames = []
+    for side, label in ((BID, 'bid'), (ASK, 'ask')):
+        lv = book[side][~np.isnan(book[side, :, PRICE])]
+        frames.append(pd.DataFrame({'price': lv[:, PRICE], 'size': lv[:, SIZE], 'side': label}))
+    return pd.concat(frames, ignore_index=True)
+
+
+class SnapshotStore:
+    """
+    Append-only columnar store of full L2 depth, one partition per symbol and UTC day.
+
+    Each partition is a directory holding two raw little-endian files:
+        ts.i8    int64 exchange/poll timestamps in ms, shape (n,)
+        book.f8  float64 books, shape (n, 2, depth, 2) = [tick, side, level, (price, size)]
+    plus meta.json with the depth. Files are read back with np.memmap, so replay
+    streams books straight from disk without parsing or pandas.
+    """
+
+    def __init__(self, root: str, depth: int = 20):
+        self.root = root
+        self.depth = depth
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def _key(symbol: str) -> str:
+        return symbol.replace('/', '-').replace(':', '-')
+
+    def _partition(self, symbol: str, day: str) -> str:
+        return os.path.join(self.root, self._key(symbol), day)
+
+    def _ensure_partition(self, path: str):
+        meta = os.path.join(path, 'meta.json')
+        if os.path.exists(meta):
+            with open(meta) as f:
+                depth = json.load(f)['depth']
+            if depth != self.depth:
+                raise ValueError(f"Partition {path} has depth {depth}, store uses {self.depth}")
+            return
+        os.makedirs(path, exist_ok=True)
+        with open(meta, 'w') as f:
+            json.dump({'depth': self.depth, 'layout': ['side', 'level', 'price_size']}, f)
+
+    def _repair(self, path: str):
+        """Cut both files back to the rows present in both, dropping a torn tail from a crashed append."""
+        ts_path, book_path = os.path.join(path, 'ts.i8'), os.path.join(path, 'book.f8')
+        if not os.path.exists(ts_path) or not os.path.exists(book_path):
+            open(ts_path, 'ab').close()
+            open(book_path, 'ab').close()
+        row_bytes = 2 * self.depth * 2 * 8
+        n = min(os.path.getsize(ts_path) // 8, os.path.getsize(book_path) // row_bytes)
+        for p, size in ((ts_path, n * 8), (book_path, n * row_bytes)):
+            if os.path.getsize(p) != size:
+                log.warning(f"Truncating torn tail of {p} to {n} rows")
+                os.truncate(p, size)
+
+    def append(self, symbol: str, bids, asks, ts_ms: int = None):
+        """Append one book (ccxt bids/asks lists). ts_ms defaults to now."""
+        if ts_ms is None:
+            ts_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+        book = book_array(bids, asks, self.depth)
+        self.append_many(symbol, np.array([ts_ms], dtype=np.int64), book[None])
+
+    def append_many(self, symbol: str, ts_ms: np.ndarray, books: np.ndarray):
+        """Append a block of books, shape (n, 2, depth, 2), split by UTC day."""
+        ts_ms = np.asarray(ts_ms, dtype='<i8')
+        books = np.asarray(books, dtype='<f8')
+        if books.shape[1:] != (2, self.depth, 2) or books.shape[0] != ts_ms.shape[0]:
+            raise ValueError(f"books must have shape (n, 2, {self.depth}, 2) matching ts_ms")
+        days = ts_ms // 86_400_000
+        for d in np.unique(days):
+            mask = days == d
+            day = datetime.fromtimestamp(int(d) * 86400, tz=timezone.utc).strftime('%Y-%m-%d')
+            path = self._partition(symbol, day)
+            self._ensure_partition(path)
+            # a torn earlier append would shift every later tick against its book: cut it off first
+            self._repair(path)
+            with open(os.path.join(path, 'book.f8'), 'ab') as f:
+                f.write(np.ascontiguousarray(books[mask]).tobytes())
+            with open(os.path.join(path, 'ts.i8'), 'ab') as f:
+                f.write(ts_ms[mask].tobytes())
+
+    def symbols(self) -> list:
+        return sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+
+    def days(self, symbol: str) -> list:
+        path = os.path.join(self.root, self._key(symbol))
+        return sorted(os.listdir(path)) if os.path.isdir(path) else []
+
+    def load(self, symbol: str, day: str):
+        """
+        Memory-map one partition. Returns (ts, books) with shapes (n,) and (n, 2, depth, 2).
+        Both are read-only views on disk.
+        """
+        path = self._partition(symbol, day)
+        ts_path, book_path = os.path.join(path, 'ts.i8'), os.path.join(path, 'book.f8')
+        row_bytes = 2 * self.depth * 2 * 8
+        n = min(os.path.getsize(ts_path) // 8, os.path.getsize(book_path) // row_bytes)
+        if n == 0:
+            return np.empty(0, dtype='<i8'), np.empty((0, 2, self.depth, 2))
+        ts = np.memmap(ts_path, dtype='<i8', mode='r', shape=(n,))
+        books = np.memmap(book_path, dtype='<f8', mode='r', shape=(n, 2, self.depth, 2))
+        return ts, books
+
+    def replay(self, symbol: str, start_day: str = None, end_day: str = None, chunk: int = 100_000):
+        """
+        Stream (ts, books) blocks of at most `chunk` ticks across day partitions
+        in [start_day, end_day] ('YYYY-MM-DD', inclusive).
+        """
+        for day in self.days(symbol):
+            if (start_day and day < start_day) or (end_day and day > end_day):
+                continue
+            ts, books = self.load(symbol, day)
+            for i in range(0, len(ts), chunk):
+                yield ts[i:i + chunk], books[i:i + chunk]
@@ -0,0 +1,60 @@
+import time
+import threading
+
+
+class TTLStore:
+    """
+    Thread-safe in-memory key/value store whose entries expire after a TTL.
+
+    Shared between ExchangeClient instances and the pricer/risk modules so
+    that market reference data (funding, mark/index prices) is fetched once
+    and reused until it goes stale.
+    """
+
+    def __init__(self, default_ttl: float = 30.0, clock=time.monotonic):
+        self.default_ttl = default_ttl
+        self._clock = clock
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def set(self, key, value, ttl: float = None):
+        expires = self._clock() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            if item[0] < self._clock():
+                del self._data[key]
+                return default
+            return item[1]
+
+    def get_many(self, keys) -> dict:
+        """Fresh entries among keys, as {key: value}."""
+        missing = object()
+        out = {}
+        for k in keys:
+            v = self.get(k, missing)
+            if v is not missing:
+                out[k] = v
+        return out
+
+    def get_or_fetch(self, key, fetch, ttl: float = None):
+        """Return the cached value or call fetch() and cache its result."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = fetch()
+            self.set(key, value, ttl)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Process-wide store for funding, mark and index data
+carry_store = TTLStore()
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from core import batch_report
+from core.batch_report import compute_risk, consolidate, read_report, write_report
+
+
+@pytest.fixture
+def report():
+    rng = np.random.default_rng(0)
+    closes = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.01, 24 * 260)))
+    positions = [('BTC/USDT', 'spot', 2.0), ('ETH/USDT', 'perp', -3.0)]
+    data = {(s, m): (closes[-1], closes) for s, m, _ in positions}
+    return consolidate(compute_risk(data, positions))
+
+
+def test_default_format_is_columnar_without_a_parquet_engine(report, tmp_path, monkeypatch):
+    monkeypatch.setattr(batch_report, 'parquet_available', lambda: False)
+    paths = write_report(report, str(tmp_path), stamp='t')
+    assert [p.rsplit('.', 1)[1] for p in paths] == ['npz']
+    back = read_report(paths[0])
+    assert list(back.columns) == list(report.columns)
+    assert back['Symbol'].tolist() == report['Symbol'].tolist()
+    np.testing.assert_allclose(back['Net PnL'].to_numpy(), report['Net PnL'].to_numpy(), equal_nan=True)
+
+
+def test_csv_is_opt_in(report, tmp_path):
+    paths = write_report(report, str(tmp_path), fmt='csv', markdown=True, stamp='t')
+    assert [p.rsplit('.', 1)[1] for p in paths] == ['csv', 'md']
+    assert len(read_report(paths[0])) == len(report)
+
+
+def test_unknown_format_is_rejected(report, tmp_path):
+    with pytest.raises(ValueError):
+        write_report(report, str(tmp_path), fmt='xlsx')
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from benchmarks.fakes import FakeExchange
+from core.consolidated_book import ConsolidatedBook, merge_levels
+from core.exchange_client import ExchangeClient
+from core.snapshot_store import BID, ASK
+
+
+def _book(bids, asks):
+    return np.array(bids, dtype=float), np.array(asks, dtype=float)
+
+
+def test_merge_orders_best_first_and_keeps_venue_order_on_ties():
+    books = [_book([[100.0, 1.0], [99.0, 2.0]], [[101.0, 1.0], [103.0, 2.0]]),
+             _book([[100.5, 3.0], [100.0, 4.0], [98.0, 5.0]], [[101.0, 3.0], [102.0, 4.0]])]
+    bids = merge_levels(books, BID)
+    assert bids['price'].tolist() == [100.5, 100.0, 100.0, 99.0, 98.0]
+    assert bids['venue'].tolist() == [1, 0, 1, 0, 1]
+    assert bids['size'].tolist() == [3.0, 1.0, 4.0, 2.0, 5.0]
+    asks = merge_levels(books, ASK)
+    assert asks['price'].tolist() == [101.0, 101.0, 102.0, 103.0]
+    assert asks['venue'].tolist() == [0, 1, 1, 0]
+
+
+def test_merge_handles_an_empty_venue():
+    books = [_book(np.empty((0, 2)), np.empty((0, 2))), _book([[100.0, 1.0]], [[101.0, 1.0]])]
+    assert merge_levels(books, BID)['venue'].tolist() == [1]
+    assert len(merge_levels([books[0]], ASK)) == 0
+
+
+def test_injected_client_takes_its_venue_from_client_id():
+    a = ExchangeClient('spot', client=FakeExchange(exchange_id='venue_a'))
+    b = ExchangeClient('spot', client=FakeExchange(exchange_id='venue_b'))
+    assert (a.exchange_id, b.exchange_id) == ('venue_a', 'venue_b')
+    assert a.scheduler is not b.scheduler and a.store is not b.store
+    assert ExchangeClient('spot', client=FakeExchange(exchange_id='venue_a')).scheduler is a.scheduler
+    assert ExchangeClient('spot', exchange_id='venue_c', client=FakeExchange()).exchange_id == 'venue_c'
+
+
+def test_injected_client_without_an_id_is_rejected():
+    class Anonymous:
+        def fetch_order_book(self, symbol, limit=None):
+            return {'bids': [], 'asks': []}
+
+    with pytest.raises(ValueError):
+        ExchangeClient('spot', client=Anonymous())
+
+
+def test_consolidated_book_over_two_fake_venues():
+    fakes = {'venue_a:spot': FakeExchange(mid=100.0, levels=20, seed=1, exchange_id='venue_a'),
+             'venue_b:spot': FakeExchange(mid=100.2, levels=20, seed=2, exchange_id='venue_b')}
+    clients = {label: ExchangeClient('spot', client=fx) for label, fx in fakes.items()}
+    with ConsolidatedBook(clients, 'BTC/USDT', limit=20) as cb:
+        cb.refresh()
+        assert [fx.calls for fx in fakes.values()] == [1, 1]
+        assert cb.errors == {}
+        assert len(cb.bids) == len(cb.asks) == 40
+        assert np.all(np.diff(cb.bids['price']) <= 0) and np.all(np.diff(cb.asks['price']) >= 0)
+        assert cb.bids['venue'][0] == 1 and cb.asks['venue'][0] == 0    # venue_b quotes higher
+        assert cb.best_bid() == max(cb._books[v][0][0, 0] for v in cb.venues)
+        depth = cb.depth_by_venue('bid')
+        for venue in cb.venues:
+            assert depth[venue] == pytest.approx(cb._books[venue][0][:, 1].sum())
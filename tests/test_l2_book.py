@@ -0,0 +1,79 @@
+import pytest
+
+from core.l2_book import L2Book, RecordedDiffFeed, SequenceGap, run_book
+
+
+def snapshot(last_id, bids, asks):
+    return {'type': 'snapshot', 'lastUpdateId': last_id, 'bids': bids, 'asks': asks}
+
+
+def diff(first, last, b=(), a=()):
+    return {'type': 'diff', 'U': first, 'u': last, 'b': [list(x) for x in b], 'a': [list(x) for x in a]}
+
+
+def replay(tmp_path, messages, **kwargs):
+    path = str(tmp_path / 'feed.jsonl')
+    RecordedDiffFeed.record(path, messages)
+    return run_book(RecordedDiffFeed(path), L2Book('BTC/USDT'), **kwargs)
+
+
+def test_in_order_diffs_are_applied(tmp_path):
+    seen = []
+    book = replay(tmp_path, [
+        snapshot(10, [[100.0, 1.0], [99.0, 2.0]], [[101.0, 1.0], [102.0, 2.0]]),
+        diff(8, 10, b=[(100.0, 9.0)]),                  # already in the snapshot: skipped
+        diff(11, 12, b=[(100.5, 3.0)]),
+        diff(13, 13, a=[(101.0, 4.0)]),
+    ], on_update=lambda b: seen.append(b.last_update_id))
+    assert seen == [12, 13]
+    assert book.bids() == [[100.5, 3.0], [100.0, 1.0], [99.0, 2.0]]
+    assert book.asks() == [[101.0, 4.0], [102.0, 2.0]]
+    assert book.mid() == pytest.approx(100.75)
+
+
+def test_size_zero_removes_the_level(tmp_path):
+    book = replay(tmp_path, [
+        snapshot(10, [[100.0, 1.0], [99.0, 2.0]], [[101.0, 1.0], [102.0, 2.0]]),
+        diff(11, 11, b=[(100.0, 0.0)], a=[(101.0, 0.0), (105.0, 0.0)]),   # 105 was never there
+    ])
+    assert book.bids() == [[99.0, 2.0]]
+    assert book.asks() == [[102.0, 2.0]]
+    assert book.best_bid() == 99.0 and book.best_ask() == 102.0
+
+
+def test_gap_resyncs_from_a_newer_snapshot(tmp_path):
+    book = replay(tmp_path, [
+        snapshot(10, [[100.0, 1.0]], [[101.0, 1.0]]),
+        diff(11, 11, b=[(100.0, 2.0)]),
+        diff(15, 16, b=[(100.0, 7.0)]),                 # gap: 12..14 missing
+        snapshot(16, [[100.0, 5.0]], [[101.0, 5.0]]),
+        diff(15, 16, b=[(100.0, 7.0)]),                 # covered by the snapshot: skipped
+        diff(17, 17, a=[(101.0, 6.0)]),
+    ])
+    assert book.last_update_id == 17
+    assert book.bids() == [[100.0, 5.0]]
+    assert book.asks() == [[101.0, 6.0]]
+
+
+def test_stale_snapshot_is_not_used_to_bridge_a_gap(tmp_path):
+    book = replay(tmp_path, [
+        snapshot(10, [[100.0, 1.0]], [[101.0, 1.0]]),
+        diff(20, 21, b=[(100.0, 2.0)]),                 # gap: needs a snapshot at or after 19
+        snapshot(12, [[90.0, 1.0]], [[91.0, 1.0]]),     # too old to bridge it
+        diff(22, 22, b=[(100.0, 3.0)]),                 # dropped while waiting
+        snapshot(22, [[100.0, 4.0]], [[101.0, 4.0]]),
+        diff(23, 23, b=[(99.0, 1.0)]),
+    ])
+    assert book.last_update_id == 23
+    assert book.bids() == [[100.0, 4.0], [99.0, 1.0]]
+    assert book.asks() == [[101.0, 4.0]]
+
+
+def test_feed_ending_inside_a_gap_raises(tmp_path):
+    with pytest.raises(SequenceGap):
+        replay(tmp_path, [
+            snapshot(10, [[100.0, 1.0]], [[101.0, 1.0]]),
+            diff(20, 21, b=[(100.0, 2.0)]),
+            snapshot(12, [[90.0, 1.0]], [[91.0, 1.0]]),
+            diff(22, 22, b=[(100.0, 3.0)]),
+        ])
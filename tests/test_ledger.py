@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from core.ledger import Ledger
+
+
+@pytest.mark.parametrize('method', ['fifo', 'average'])
+def test_realized_and_unrealized_pnl(method):
+    led = Ledger(method)
+    led.add_fills('BTC/USDT', [100.0, 110.0, 120.0], [1.0, 1.0, -1.0], fees=0.5)
+    r = led.report('BTC/USDT', 130.0)
+    assert r.inventory == 1.0
+    expected_realized = (120.0 - 100.0 if method == 'fifo' else 120.0 - 105.0) - 1.5
+    assert r.realized == pytest.approx(expected_realized)
+    assert r.unrealized == pytest.approx(130.0 - (110.0 if method == 'fifo' else 105.0))
+
+
+def test_mark_reports_unknown_symbols_flat_without_registering_them():
+    led = Ledger()
+    led.add_fill('BTC/USDT', 100.0, 2.0)
+    r = led.mark({'BTC/USDT': 110.0, 'ETH/USDT': 3000.0}, ['BTC/USDT', 'ETH/USDT'])
+    np.testing.assert_allclose(r.inventory, [2.0, 0.0])
+    np.testing.assert_allclose(r.unrealized, [20.0, 0.0])
+    np.testing.assert_allclose(r.realized, [0.0, 0.0])
+    assert led.symbols == ['BTC/USDT']
+    assert led.report('SOL/USDT', 150.0).total == 0.0
+    assert led.symbols == ['BTC/USDT']
@@ -0,0 +1,149 @@
+import time
+import threading
+
+import ccxt
+import pytest
+
+from core.request_scheduler import RequestScheduler
+
+
+class FakeClock:
+    """Monotonic clock that only moves when the scheduler sleeps."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeClient:
+    """ccxt-like client; fetch_order_book raises the queued errors first, then returns a book."""
+
+    def __init__(self, exchange_id='fake', errors=(), gate=None):
+        self.id = exchange_id
+        self.errors = list(errors)
+        self.gate = gate
+        self.calls = 0
+        self.entered = threading.Event()
+
+    def fetch_order_book(self, symbol, limit=None):
+        self.calls += 1
+        self.entered.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.errors:
+            raise self.errors.pop(0)
+        return {'venue': self.id, 'symbol': symbol}
+
+    def fetch_ticker(self, symbol):
+        self.calls += 1
+        return {'symbol': symbol}
+
+
+def scheduler(clock, limit=10, **kwargs):
+    kwargs.setdefault('jitter', 0.0)
+    return RequestScheduler('fake', limits={'spot': limit}, window_s=60.0, clock=clock, sleep=clock.sleep,
+                            **kwargs)
+
+
+def test_weight_budget_queues_until_the_window_rolls():
+    clock = FakeClock()
+    sched = scheduler(clock, limit=10)
+    client = FakeClient()
+    for _ in range(2):
+        sched.call(client.fetch_order_book, ('BTC/USDT',), weight=5)
+    assert clock.now == 0.0 and sched.metrics()['weight_used'] == {'spot': 10}
+
+    sched.call(client.fetch_order_book, ('BTC/USDT',), weight=5)
+    assert clock.now == pytest.approx(60.0)       # waited for the first request to leave the window
+    assert client.calls == 3
+    assert sched.metrics()['queue_depth'] == 0
+
+
+def test_markets_have_separate_budgets():
+    clock = FakeClock()
+    sched = RequestScheduler('fake', limits={'spot': 5, 'perp': 5}, clock=clock, sleep=clock.sleep)
+    client = FakeClient()
+    sched.call(client.fetch_order_book, ('BTC/USDT',), market='spot', weight=5)
+    sched.call(client.fetch_order_book, ('BTC/USDT',), market='perp', weight=5)
+    assert clock.now == 0.0
+
+
+@pytest.mark.parametrize('error', [ccxt.RateLimitExceeded, ccxt.DDoSProtection])
+def test_rate_limit_retries_after_a_cooldown(error):
+    clock = FakeClock()
+    sched = scheduler(clock, limit=100, base_delay=1.0)
+    client = FakeClient(errors=[error('429')])
+    assert sched.call(client.fetch_order_book, ('BTC/USDT',)) == {'venue': 'fake', 'symbol': 'BTC/USDT'}
+    assert client.calls == 2
+    assert clock.now == pytest.approx(1.0)
+    m = sched.metrics()
+    assert m['rate_limited'] == 1 and m['retries'] == 1 and m['requests'] == 1
+
+
+def test_rate_limit_pauses_the_whole_exchange():
+    clock = FakeClock()
+    sched = scheduler(clock, limit=100, base_delay=2.0)
+    client = FakeClient(errors=[ccxt.RateLimitExceeded('429')])
+    with pytest.raises(RuntimeError):
+        sched.call(client.fetch_order_book, ('BTC/USDT',), retries=1)
+    assert sched.metrics()['cooldown_s'] == pytest.approx(2.0)
+
+    sched.call(client.fetch_ticker, ('ETH/USDT',))    # another method still waits out the pause
+    assert clock.now == pytest.approx(2.0)
+
+
+def test_oversized_weight_is_rejected():
+    clock = FakeClock()
+    sched = scheduler(clock, limit=10)
+    client = FakeClient()
+    with pytest.raises(ValueError):
+        sched.call(client.fetch_order_book, ('BTC/USDT',), weight=11)
+    assert client.calls == 0 and clock.sleeps == []
+
+
+def _in_thread(func):
+    out = {}
+    t = threading.Thread(target=lambda: out.setdefault('result', func()))
+    t.start()
+    return t, out
+
+
+def test_identical_in_flight_calls_on_one_client_are_coalesced():
+    sched = RequestScheduler('fake', limits={'spot': 100})
+    gate = threading.Event()
+    client = FakeClient(gate=gate)
+    t1, r1 = _in_thread(lambda: sched.call(client.fetch_order_book, ('BTC/USDT',)))
+    assert client.entered.wait(5)
+    t2, r2 = _in_thread(lambda: sched.call(client.fetch_order_book, ('BTC/USDT',)))
+    for _ in range(500):
+        if sched.metrics()['coalesced']:
+            break
+        time.sleep(0.01)
+    gate.set()
+    t1.join(5)
+    t2.join(5)
+    assert client.calls == 1
+    assert sched.metrics()['coalesced'] == 1
+    assert r1['result'] is r2['result']
+
+
+def test_same_call_on_two_clients_is_not_coalesced():
+    sched = RequestScheduler('fake', limits={'spot': 100})
+    gate = threading.Event()
+    a, b = FakeClient('venue_a', gate=gate), FakeClient('venue_b', gate=gate)
+    t1, r1 = _in_thread(lambda: sched.call(a.fetch_order_book, ('BTC/USDT',)))
+    t2, r2 = _in_thread(lambda: sched.call(b.fetch_order_book, ('BTC/USDT',)))
+    assert a.entered.wait(5) and b.entered.wait(5)    # both requests are in flight at once
+    gate.set()
+    t1.join(5)
+    t2.join(5)
+    assert (a.calls, b.calls) == (1, 1)
+    assert r1['result']['venue'] == 'venue_a' and r2['result']['venue'] == 'venue_b'
+    assert sched.metrics()['coalesced'] == 0
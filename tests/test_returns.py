@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+from core.returns import Returns
+
+
+def _returns(n: int = 100) -> Returns:
+    rng = np.random.default_rng(0)
+    return Returns(100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.01, n))))
+
+
+def test_window_is_trailing_and_capped_at_the_series():
+    rets = _returns()
+    np.testing.assert_array_equal(rets.window(1, 5), rets.horizon(1)[-5:])
+    assert rets.window(1, 10_000).shape == (99,)
+
+
+@pytest.mark.parametrize('lookback', [0, -3])
+def test_window_rejects_empty_lookback(lookback):
+    with pytest.raises(ValueError):
+        _returns().window(1, lookback)
@@ -0,0 +1,48 @@
+import os
+
+import numpy as np
+
+from core.snapshot_store import SnapshotStore, book_array
+
+DAY = '1970-01-01'
+
+
+def _book(px: float):
+    return book_array([[px, 1.0]], [[px + 1.0, 2.0]], depth=2)
+
+
+def test_append_and_load_round_trip(tmp_path):
+    store = SnapshotStore(str(tmp_path), depth=2)
+    store.append('BTC/USDT', [[100.0, 1.0]], [[101.0, 2.0]], ts_ms=1000)
+    store.append('BTC/USDT', [[200.0, 1.0]], [[201.0, 2.0]], ts_ms=2000)
+    ts, books = store.load('BTC/USDT', DAY)
+    assert list(ts) == [1000, 2000]
+    np.testing.assert_array_equal(books[1], _book(200.0))
+
+
+def test_torn_write_is_cut_off_before_next_append(tmp_path):
+    store = SnapshotStore(str(tmp_path), depth=2)
+    store.append('BTC/USDT', [[100.0, 1.0]], [[101.0, 2.0]], ts_ms=1000)
+    # crash mid-append: a partial book row lands, its timestamp never does
+    path = os.path.join(str(tmp_path), 'BTC-USDT', DAY)
+    with open(os.path.join(path, 'book.f8'), 'ab') as f:
+        f.write(_book(999.0).tobytes()[:40])
+    store.append('BTC/USDT', [[200.0, 1.0]], [[201.0, 2.0]], ts_ms=2000)
+
+    ts, books = store.load('BTC/USDT', DAY)
+    assert list(ts) == [1000, 2000]
+    np.testing.assert_array_equal(books[0], _book(100.0))
+    np.testing.assert_array_equal(books[1], _book(200.0))
+
+
+def test_full_book_row_without_timestamp_is_dropped(tmp_path):
+    store = SnapshotStore(str(tmp_path), depth=2)
+    store.append('BTC/USDT', [[100.0, 1.0]], [[101.0, 2.0]], ts_ms=1000)
+    path = os.path.join(str(tmp_path), 'BTC-USDT', DAY)
+    with open(os.path.join(path, 'book.f8'), 'ab') as f:
+        f.write(_book(999.0).tobytes())
+    store.append('BTC/USDT', [[200.0, 1.0]], [[201.0, 2.0]], ts_ms=2000)
+
+    ts, books = store.load('BTC/USDT', DAY)
+    assert list(ts) == [1000, 2000]
+    np.testing.assert_array_equal(books[1], _book(200.0))